@@ -1,66 +1,127 @@
+import os
 import random
+import tempfile
+from collections import deque, OrderedDict
+from collections.abc import Sequence
+from struct import Struct
+
+from game_random import make_rng
+
+# Ячейка поля хранится в одном байте общего bytearray поля
+NUMBER = 0x0F  # биты числа мин вокруг ячейки
+NO_NUMBER = 0x0F  # число мин вокруг еще не подсчитано
+MINE = 0x10  # в ячейке мина
+OPEN = 0x20  # ячейка открыта
+FLAG = 0x40  # ячейка помечена флажком
+HIDDEN = 9  # закрытая ячейка в видимом состоянии поля (visible)
+# Заголовок снимка поля: m, n, число мин, число закрытых ячеек, признаки
+# конца игры (бит 0) и победы (бит 1); за ним - байты ячеек
+SNAPSHOT_HEADER = Struct('<HHIIB')
+
+# Таблицы для bytes.translate: байт ячейки -> видимое значение / символ
+# (флажок виден только в символьном виде: для решателя ячейка закрыта)
+VISIBLE = bytes(byte & NUMBER if byte & OPEN else HIDDEN
+                for byte in range(256))
+SYMBOLS = bytes((ord("F") if byte & FLAG else ord("*")) if not byte & OPEN
+                else ord("!") if byte & MINE
+                else ord("0") + (byte & NUMBER) % 10 for byte in range(256))
 
 
 class Cell:
+    """Ячейка поля - представление байта ячейки в общем bytearray поля
+    (у отдельно созданной ячейки - в собственном bytearray из 1 байта).
+    Значения проверяются только при изменении через атрибуты ячейки"""
+    __slots__ = ('__cells', '__index')
 
-    def __init__(self):
-        self.__is_mine = False
-        self.__number = None
-        self.__is_open = False
+    def __init__(self, cells=None, index=0):
+        self.__cells = bytearray([NO_NUMBER]) if cells is None else cells
+        self.__index = index
+
+    def __set_bit(self, bit, value):
+        if type(value) != bool:
+            raise ValueError("недопустимое значение атрибута")
+        if value:
+            self.__cells[self.__index] |= bit
+        else:
+            self.__cells[self.__index] &= ~bit
 
     @property
     def is_mine(self):
-        return self.__is_mine
+        return bool(self.__cells[self.__index] & MINE)
 
     @is_mine.setter
     def is_mine(self, value):
-        if type(value) != bool:
-            raise ValueError("недопустимое значение атрибута")
-        self.__is_mine = value
+        self.__set_bit(MINE, value)
 
     @property
     def number(self):
-        return self.__number
+        number = self.__cells[self.__index] & NUMBER
+        return None if number == NO_NUMBER else number
 
     @number.setter
     def number(self, value):
         if type(value) != int or value not in range(9):
             raise ValueError("недопустимое значение атрибута")
-        self.__number = value
+        self.__cells[self.__index] = (self.__cells[self.__index] & ~NUMBER
+                                      | value)
 
     @property
     def is_open(self):
-        return self.__is_open
+        return bool(self.__cells[self.__index] & OPEN)
 
     @is_open.setter
     def is_open(self, value):
-        if type(value) != bool:
-            raise ValueError("недопустимое значение атрибута")
-        self.__is_open = value
+        self.__set_bit(OPEN, value)
 
     def __bool__(self):
-        return not self.__is_open
+        return not self.is_open
 
 
-class GamePole:
-    __instance = None
+class LazyRows(Sequence):
+    """Последовательность длины length, элементы которой создаются
+    при обращении функцией item(номер) и не хранятся (строки поля
+    и ячейки строки в GamePole.pole)"""
+    __slots__ = ('_length', '_item')
+
+    def __init__(self, length, item):
+        self._length = length
+        self._item = item
 
-    def __new__(cls, *args, **kwargs):
-        if not cls.__instance:
-            cls.__instance = super().__new__(cls)
-        return cls.__instance
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._item(i) for i in range(self._length)[index]]
+        return self._item(range(self._length)[index])
+
+
+class GamePole:
+    """Поле m x n с total_mines минами. rng - генератор случайных
+    чисел для расстановки мин (см. make_rng)"""
 
-    def __init__(self, m, n, total_mines):
+    def __init__(self, m, n, total_mines, rng=None):
+        self.__rng = make_rng(rng)
         self.__game_over = False
         self.M = m
         self.N = n
         self.total_mines = total_mines
-        self.__pole_cells = [[Cell() for _ in range(m)] for _ in range(n)]
+        self.__cells = bytearray([NO_NUMBER]) * (m * n)
         self.__win = False
+        self.__closed = m * n
 
-    def start_game(self):
+    def start_game(self, cache=None):
+        """Игра в консоли. Если задан cache (BoardCache из
+        Minesweeper_generator), поле берется из кеша готовых полей,
+        решаемых без угадывания, и первая ячейка открывается сразу"""
         print("_" * 30)
-        self.init_pole()
+        if cache is None:
+            self.init_pole()
+        else:
+            start, mines = cache.get(self.M, self.N, self.total_mines,
+                                     self.__rng)
+            self.init_pole(mines)
+            self.open_cell(*divmod(start, self.M))
         self.show_pole()
         while not self.__game_over:
             try:
@@ -78,25 +139,45 @@ class GamePole:
         else:
             print("Упс, вы подорвались. Попробуйте еще раз.")
 
-    def init_pole(self):
-        current_mines = 0
-        while current_mines != self.total_mines:
-            i, j = random.randint(0, self.N - 1), random.randint(0,
-                                                                 self.M - 1)
-            if not self.pole[i][j].is_mine:
-                self.pole[i][j].is_mine = True
-                current_mines += 1
-        for i in range(self.N):
-            for j in range(self.M):
-                self.pole[i][j].number = self.count_mines(i, j)
+    def init_pole(self, mines=None):
+        """Расстановка мин одной случайной выборкой без повторов
+        (или по готовой расстановке mines - байт на ячейку)
+        и подсчет чисел мин вокруг ячеек сразу для всего поля"""
+        size = self.M * self.N
+        if self.total_mines not in range(size + 1):
+            raise ValueError("Число мин больше числа ячеек поля")
+        if mines is None:
+            mines = bytearray(size)
+            for idx in self.__rng.sample(range(size), self.total_mines):
+                mines[idx] = 1
+        elif len(mines) != size or sum(mines) != self.total_mines:
+            raise ValueError("Расстановка мин не соответствует полю")
+        # число мин вокруг (не больше 8) - в младших 4 битах байта,
+        # мина (0 / 1) - в бите MINE, поэтому переносов между байтами нет
+        counts = count_neighbours(mines, self.M, self.N)
+        self.__cells[:] = (int.from_bytes(counts, "little")
+                           | int.from_bytes(mines, "little") << 4
+                           ).to_bytes(size, "little")
 
     def show_pole(self):
         print(" " * 4, *range(self.M), end="\n" * 2)
-        for i in range(self.N):
+        for i, row in enumerate(self.get_text_pole()):
             print(i, end=" " * 4)
-            for j in self.pole[i]:
-                print(self.show_cell(j), end=" ")
-            print()
+            print(row)
+
+    def get_text_pole(self):
+        """Строки поля в символьном виде: * - закрытая ячейка,
+        F - закрытая ячейка с флажком, ! - мина, число - мин вокруг
+        открытой ячейки"""
+        m = self.M
+        text = self.__cells.translate(SYMBOLS).decode()
+        return [" ".join(text[i * m:(i + 1) * m]) + " "
+                for i in range(self.N)]
+
+    def visible(self):
+        """Видимое игроку состояние поля по номерам ячеек: число мин
+        вокруг для открытых ячеек и HIDDEN для закрытых"""
+        return bytes(self.__cells.translate(VISIBLE))
 
     @staticmethod
     def show_cell(obj):
@@ -107,37 +188,306 @@ class GamePole:
         return obj.number
 
     def open_cell(self, x, y):
-        if x < 0 or y < 0 or x > self.N or y > self.M:
+        """Открытие ячейки. Область пустых ячеек (number == 0) открывается
+        обходом в ширину; число закрытых ячеек считается по ходу открытия,
+        поэтому проверка победы не просматривает все поле"""
+        if not (0 <= x < self.N and 0 <= y < self.M):
             raise IndexError("Некорректные индексы i, j клетки игрового поля")
-        obj = self.pole[x][y]
-        if obj.is_open:
+        m, n = self.M, self.N
+        cells = self.__cells
+        start = x * m + y
+        if cells[start] & OPEN:
             raise IndexError("Ячейка уже открыта")
-        obj.is_open = True
-        if obj.number == 0:
-            for a in range(max(0, x - 1), min(x + 2, self.N)):
-                for b in range(max(0, y - 1), min(y + 2, self.M)):
-                    if self.pole[a][b]:
-                        self.open_cell(a, b)
-        if obj.is_mine:
+        if cells[start] & FLAG:
+            raise IndexError("Ячейка помечена флажком")
+        cells[start] |= OPEN
+        self.__closed -= 1
+        if cells[start] & MINE:
             self.__game_over = True
-        elif self.count_open_cell() == self.total_mines:
+            return
+        queue = deque([(x, y)])
+        while queue:
+            i, j = queue.popleft()
+            if cells[i * m + j] & NUMBER != 0:
+                continue
+            for a in range(max(0, i - 1), min(i + 2, n)):
+                for b in range(max(0, j - 1), min(j + 2, m)):
+                    idx = a * m + b
+                    if not cells[idx] & (OPEN | FLAG):
+                        cells[idx] |= OPEN
+                        self.__closed -= 1
+                        queue.append((a, b))
+        if self.__closed == self.total_mines:
             self.__game_over = True
             self.__win = True
 
+    def toggle_flag(self, x, y):
+        """Установка / снятие флажка на закрытой ячейке"""
+        if not (0 <= x < self.N and 0 <= y < self.M):
+            raise IndexError("Некорректные индексы i, j клетки игрового поля")
+        if self.__cells[x * self.M + y] & OPEN:
+            raise IndexError("Ячейка уже открыта")
+        self.__cells[x * self.M + y] ^= FLAG
+
     @property
     def pole(self):
-        return self.__pole_cells
+        """Ячейки поля по строкам: pole[i][j] за O(1). Строки и ячейки -
+        представления байтов поля, создаются при обращении, а не хранятся
+        вместе с полем"""
+        m, cells = self.M, self.__cells
+        return LazyRows(self.N, lambda i: LazyRows(
+            m, lambda j: Cell(cells, i * m + j)))
+
+    def cell(self, i, j):
+        """Ячейка (Cell) в строке i и столбце j"""
+        if not (0 <= i < self.N and 0 <= j < self.M):
+            raise IndexError("Некорректные индексы i, j клетки игрового поля")
+        return Cell(self.__cells, i * self.M + j)
+
+    @property
+    def game_over(self):
+        return self.__game_over
+
+    @property
+    def win(self):
+        return self.__win
 
     def count_mines(self, n, m):
+        cells = self.__cells
         count = 0
         for i in range(max(0, n - 1), min(n + 2, self.N)):
             for j in range(max(0, m - 1), min(m + 2, self.M)):
-                count += self.pole[i][j].is_mine
-        count -= self.pole[n][m].is_mine
-        return count
+                count += cells[i * self.M + j] & MINE
+        count -= cells[n * self.M + m] & MINE
+        return count // MINE
 
     def count_open_cell(self):
-        return sum([1 for line in self.pole for cell in line if cell])
+        """Число закрытых ячеек"""
+        return self.__cells.translate(VISIBLE).count(HIDDEN)
+
+    def snapshot(self):
+        """Состояние поля в упакованном виде: заголовок SNAPSHOT_HEADER
+        и байты ячеек (мина, число, открыта, флажок)"""
+        return SNAPSHOT_HEADER.pack(
+            self.M, self.N, self.total_mines, self.__closed,
+            self.__game_over | self.__win << 1) + self.__cells
+
+    def restore(self, data):
+        """Восстановление поля из результата snapshot"""
+        m, n, total_mines, closed, flags = SNAPSHOT_HEADER.unpack_from(data)
+        if len(data) != SNAPSHOT_HEADER.size + m * n:
+            raise ValueError("Некорректный снимок поля")
+        self.M, self.N, self.total_mines = m, n, total_mines
+        self.__cells[:] = data[SNAPSHOT_HEADER.size:]
+        self.__closed = closed
+        self.__game_over = bool(flags & 1)
+        self.__win = bool(flags & 2)
+
+
+def count_neighbours(mines, m, n):
+    """Число мин вокруг каждой ячейки поля m x n.
+    Строки поля (по байту на ячейку, плюс нулевой байт-разделитель)
+    склеиваются в одно большое целое, и окно 3x3 суммируется сдвигами
+    этого числа на 1 байт (соседи по строке) и на строку (соседи по
+    столбцу). Сумма в байте не превышает 9, поэтому переносов между
+    ячейками нет"""
+    width = m + 1
+    padded = b"".join(bytes(mines[i * m:(i + 1) * m]) + b"\0"
+                      for i in range(n))
+    board = int.from_bytes(padded, "little")
+    rows = board + (board << 8) + (board >> 8)
+    window = rows + (rows << 8 * width) + (rows >> 8 * width)
+    counts = (window - board).to_bytes((n + 2) * width, "little")
+    return b"".join(counts[i * width:i * width + m] for i in range(n))
+
+
+class InfinitePole:
+    """
+    Бесконечное поле из квадратных кусков CHUNK x CHUNK ячеек.
+    Мины куска определяются зерном поля и координатами куска, поэтому
+    кусок создается только при первом обращении к нему (open_cell,
+    открытие области пустых ячеек). В памяти хранится не больше
+    max_chunks кусков: давно не использованные вытесняются, их состояние
+    (2 бита на ячейку) записывается в файл store, а мины и числа при
+    повторной загрузке вычисляются заново. Ячейка (0, 0) и ее соседи
+    без мин. Координаты ячейки - (строка, столбец), как в GamePole
+    """
+    CHUNK = 32
+    MIN_DENSITY = 0.12  # при меньшей доле мин пустая область бесконечна
+
+    def __init__(self, seed=0, density=0.16, max_chunks=256, store=None):
+        if not self.MIN_DENSITY <= density < 1:
+            raise ValueError("Недопустимая доля мин")
+        if max_chunks < 1:
+            raise ValueError("Недопустимое число кусков в памяти")
+        self.seed = seed
+        self.density = density
+        self.max_chunks = max_chunks
+        self.opened = 0
+        self.__game_over = False
+        self.__chunks = OrderedDict()  # (строка, столбец куска): байты
+        self.__index = {}  # (строка, столбец куска): смещение в store
+        self.__store = (tempfile.TemporaryFile() if store is None
+                        else open(store, "w+b"))
+
+    def start_game(self):
+        print("_" * 30)
+        x = y = 0
+        self.open_cell(x, y)
+        self.show_pole(x - 5, y - 10)
+        while not self.__game_over:
+            try:
+                print("_" * 30)
+                y, x = map(int, input("Введите координаты ячейки (x, y): "
+                                      ).split())
+                self.open_cell(x, y)
+                print("_" * 30)
+                self.show_pole(x - 5, y - 10)
+            except Exception as e:
+                print(e)
+        print("_" * 30)
+        print("Упс, вы подорвались. Открыто ячеек:", self.opened)
+        self.close()
+
+    def show_pole(self, top, left, rows=11, cols=21):
+        print(" " * 7, *(j % 10 for j in range(left, left + cols)),
+              " столбцы", left, "-", left + cols - 1)
+        for i, row in enumerate(self.get_text_pole(top, left, rows, cols)):
+            print(f"{top + i:>6}", end=" " * 2)
+            print(row)
+
+    def get_text_pole(self, top, left, rows, cols):
+        """Строки окна поля в символьном виде (как GamePole.get_text_pole).
+        Закрытые ячейки окна отображаются без создания их кусков"""
+        text = []
+        for i in range(top, top + rows):
+            row = []
+            for j in range(left, left + cols):
+                key = (i // self.CHUNK, j // self.CHUNK)
+                if key not in self.__chunks and key not in self.__index:
+                    row.append("*")
+                    continue
+                cells, idx = self.__cell(i, j)
+                row.append(chr(SYMBOLS[cells[idx]]))
+            text.append(" ".join(row) + " ")
+        return text
+
+    def open_cell(self, x, y):
+        """Открытие ячейки и обход в ширину области пустых ячеек;
+        куски, которых касается обход, создаются по мере надобности"""
+        cells, idx = self.__cell(x, y)
+        if cells[idx] & OPEN:
+            raise IndexError("Ячейка уже открыта")
+        if cells[idx] & FLAG:
+            raise IndexError("Ячейка помечена флажком")
+        cells[idx] |= OPEN
+        self.opened += 1
+        if cells[idx] & MINE:
+            self.__game_over = True
+            return
+        queue = deque([(x, y)])
+        while queue:
+            i, j = queue.popleft()
+            cells, idx = self.__cell(i, j)
+            if cells[idx] & NUMBER != 0:
+                continue
+            for a in range(i - 1, i + 2):
+                for b in range(j - 1, j + 2):
+                    cells, idx = self.__cell(a, b)
+                    if not cells[idx] & (OPEN | FLAG):
+                        cells[idx] |= OPEN
+                        self.opened += 1
+                        queue.append((a, b))
+
+    def toggle_flag(self, x, y):
+        """Установка / снятие флажка на закрытой ячейке"""
+        cells, idx = self.__cell(x, y)
+        if cells[idx] & OPEN:
+            raise IndexError("Ячейка уже открыта")
+        cells[idx] ^= FLAG
+
+    @property
+    def game_over(self):
+        return self.__game_over
+
+    @property
+    def chunks(self):
+        """Число кусков в памяти"""
+        return len(self.__chunks)
+
+    def close(self):
+        self.__store.close()
+
+    def __cell(self, x, y):
+        """Байты куска с ячейкой (x, y) и номер ячейки в куске.
+        Ссылку на байты куска нельзя хранить после обращения к другому
+        куску: кусок может быть вытеснен"""
+        c = self.CHUNK
+        key = (x // c, y // c)
+        cells = self.__chunks.get(key)
+        if cells is None:
+            cells = self.__load(*key)
+            self.__chunks[key] = cells
+            if len(self.__chunks) > self.max_chunks:
+                self.__evict()
+        else:
+            self.__chunks.move_to_end(key)
+        return cells, x % c * c + y % c
+
+    def __mines(self, ci, cj):
+        """Мины куска: случайная выборка с зерном "зерно:строка:столбец"
+        без ячеек вокруг (0, 0)"""
+        c = self.CHUNK
+        cells = [idx for idx in range(c * c)
+                 if abs(ci * c + idx // c) > 1 or abs(cj * c + idx % c) > 1]
+        mines = bytearray(c * c)
+        rng = random.Random(f"{self.seed}:{ci}:{cj}")
+        total = min(round(self.density * c * c), len(cells))
+        for idx in rng.sample(cells, total):
+            mines[idx] = 1
+        return mines
+
+    def __load(self, ci, cj):
+        """Создание куска: мины, числа по минам куска и его соседей,
+        состояние ячеек из store, если кусок уже вытеснялся"""
+        c = self.CHUNK
+        around = {(a, b): self.__mines(ci + a, cj + b)
+                  for a in (-1, 0, 1) for b in (-1, 0, 1)}
+        padded = bytearray()
+        for r in range(-1, c + 1):
+            a, row = divmod(r, c)
+            row *= c
+            padded.append(around[a, -1][row + c - 1])
+            padded += around[a, 0][row:row + c]
+            padded.append(around[a, 1][row])
+        counts = count_neighbours(padded, c + 2, c + 2)
+        numbers = b"".join(counts[(i + 1) * (c + 2) + 1:(i + 2) * (c + 2) - 1]
+                           for i in range(c))
+        cells = bytearray(number | mine << 4
+                          for number, mine in zip(numbers, around[0, 0]))
+        offset = self.__index.get((ci, cj))
+        if offset is not None:
+            self.__store.seek(offset)
+            packed = self.__store.read(c * c // 4)
+            for idx, byte in enumerate(packed):
+                for k in range(4):
+                    cells[4 * idx + k] |= (byte >> 2 * k & 3) << 5
+        return cells
+
+    def __evict(self):
+        """Вытеснение давно не использованного куска в store"""
+        key, cells = self.__chunks.popitem(last=False)
+        state = bytes(byte >> 5 & 3 for byte in cells)
+        if not any(state) and key not in self.__index:
+            return
+        offset = self.__index.get(key)
+        if offset is None:
+            offset = self.__store.seek(0, os.SEEK_END)
+            self.__index[key] = offset
+        self.__store.seek(offset)
+        self.__store.write(bytes(state[i] | state[i + 1] << 2
+                                 | state[i + 2] << 4 | state[i + 3] << 6
+                                 for i in range(0, len(state), 4)))
 
 
 if __name__ == "__main__":
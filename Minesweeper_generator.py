@@ -0,0 +1,141 @@
+"""
+Генератор полей для игры Сапер, решаемых без угадывания: после открытия
+первой ячейки (вокруг нее мин нет) все поле открывается только по
+логике решателя Minesweeper_solver.
+Подбор такого поля - перебор случайных расстановок, поэтому готовые поля
+заранее создаются в пуле процессов и хранятся в кеше на диске (BoardCache),
+откуда GamePole.start_game(cache) берет их сразу.
+Запуск: python Minesweeper_generator.py M N MINES COUNT [каталог] -
+добавить в кеш COUNT полей.
+"""
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from Minesweeper import GamePole
+from Minesweeper_solver import analyze
+
+START = 4  # байт на номер первой ячейки в записи кеша
+
+
+def is_solvable(mines, m, n, start):
+    """Открывается ли поле с расстановкой mines (байт на ячейку) от
+    ячейки start только ячейками, в которых мины точно нет"""
+    game = GamePole(m, n, sum(mines))
+    game.init_pole(mines)
+    game.open_cell(*divmod(start, m))
+    while not game.game_over:
+        analysis = analyze(game.visible(), m, n, game.total_mines)
+        if not analysis.safe:
+            return False
+        for idx in analysis.safe:
+            i, j = divmod(idx, m)
+            if game.cell(i, j):
+                game.open_cell(i, j)
+    return game.win
+
+
+def generate(m, n, total_mines, start=None, rng=random, attempts=1000):
+    """Поле m x n, решаемое без угадывания от ячейки start
+    (по умолчанию - центр поля). Возвращает (start, mines)"""
+    size = m * n
+    if start is None:
+        start = n // 2 * m + m // 2
+    i, j = divmod(start, m)
+    around = {a * m + b for a in range(max(0, i - 1), min(i + 2, n))
+              for b in range(max(0, j - 1), min(j + 2, m))}
+    cells = [idx for idx in range(size) if idx not in around]
+    if total_mines > len(cells):
+        cells = [idx for idx in range(size) if idx != start]
+    if total_mines > len(cells):
+        raise ValueError("Число мин больше числа ячеек поля")
+    for _ in range(attempts):
+        mines = bytearray(size)
+        for idx in rng.sample(cells, total_mines):
+            mines[idx] = 1
+        if is_solvable(mines, m, n, start):
+            return start, bytes(mines)
+    raise ValueError("Не удалось создать поле без угадывания")
+
+
+def _generate_seeded(task):
+    """Одно поле (выполняется в процессе пула)"""
+    board_seed, m, n, total_mines = task
+    return generate(m, n, total_mines, rng=random.Random(board_seed))
+
+
+class BoardCache:
+    """
+    Кеш готовых полей на диске: на каждый ключ (M, N, total_mines) -
+    файл <M>x<N>x<total_mines>.mines в каталоге path.
+    Записи фиксированной длины: номер первой ячейки (START байт)
+    и мины по биту на ячейку, поэтому поле берется с конца файла
+    без чтения остальных записей
+    """
+
+    def __init__(self, path="boards"):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def __file(self, m, n, total_mines):
+        return os.path.join(self.path, f"{m}x{n}x{total_mines}.mines")
+
+    @staticmethod
+    def record_size(m, n):
+        return START + (m * n + 7) // 8
+
+    def count(self, m, n, total_mines):
+        """Число полей в кеше"""
+        path = self.__file(m, n, total_mines)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // self.record_size(m, n)
+
+    def put(self, m, n, total_mines, boards):
+        """Добавление полей (start, mines) в кеш"""
+        with open(self.__file(m, n, total_mines), "ab") as stream:
+            for start, mines in boards:
+                bits = bytearray(self.record_size(m, n) - START)
+                for idx, mine in enumerate(mines):
+                    if mine:
+                        bits[idx >> 3] |= 1 << (idx & 7)
+                stream.write(start.to_bytes(START, "little") + bits)
+
+    def pop(self, m, n, total_mines):
+        """Извлечение поля (start, mines) из кеша, None - кеш пуст"""
+        if not self.count(m, n, total_mines):
+            return None
+        size = self.record_size(m, n)
+        with open(self.__file(m, n, total_mines), "r+b") as stream:
+            stream.seek(-size, os.SEEK_END)
+            record = stream.read(size)
+            stream.truncate(stream.tell() - size)
+        bits = record[START:]
+        mines = bytes(bits[idx >> 3] >> (idx & 7) & 1
+                      for idx in range(m * n))
+        return int.from_bytes(record[:START], "little"), mines
+
+    def get(self, m, n, total_mines, rng=random):
+        """Поле из кеша, а если кеш пуст - созданное на месте
+        с генератором rng"""
+        board = self.pop(m, n, total_mines)
+        if board is None:
+            board = generate(m, n, total_mines, rng=rng)
+        return board
+
+    def fill(self, m, n, total_mines, count, first_seed=None, workers=None):
+        """Создание count полей в пуле процессов (поле i - с зерном
+        first_seed + i, по умолчанию зерна случайные) и запись в кеш"""
+        if first_seed is None:
+            first_seed = random.randrange(2 ** 32)
+        tasks = [(first_seed + i, m, n, total_mines) for i in range(count)]
+        with ProcessPoolExecutor(workers) as pool:
+            self.put(m, n, total_mines, pool.map(_generate_seeded, tasks))
+
+
+if __name__ == "__main__":
+    m, n, total_mines, count = map(int, sys.argv[1:5])
+    cache = BoardCache(*sys.argv[5:6])
+    cache.fill(m, n, total_mines, count)
+    print("Полей в кеше:", cache.count(m, n, total_mines))
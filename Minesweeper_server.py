@@ -0,0 +1,108 @@
+"""
+Сервер игры Сапер: независимые партии (сессии) в одном процессе.
+Каждое соединение - отдельная сессия со своим полем GamePole.
+Протокол построчный (UTF-8), команды:
+NEW M N MINES - новая партия на поле M x N (M, N >= 1,
+не больше MAX_CELLS ячеек);
+OPEN x y - открыть ячейку (x - столбец, y - строка, как в start_game),
+ячейку с флажком открыть нельзя;
+FLAG x y - поставить / снять флажок на закрытой ячейке (в SHOW - F);
+SHOW - вывести поле;
+QUIT - завершить сессию.
+Ответ - одна или несколько строк, последняя строка ответа - ".".
+Запуск: python Minesweeper_server.py [port]
+"""
+import asyncio
+import sys
+
+from Minesweeper import GamePole
+
+HOST = "127.0.0.1"
+PORT = 8765
+OFFLOAD_CELLS = 4096  # поля от этого размера - обрабатываются в пуле потоков
+MAX_CELLS = 1_000_000  # наибольшее поле, которое можно запросить по NEW
+
+
+class Session:
+    """Состояние одного соединения и разбор его команд"""
+
+    def __init__(self):
+        self.game = None
+        self.closed = False
+
+    def cells(self, line):
+        """Число ячеек поля, с которым работает команда: для NEW -
+        запрошенного поля, для остальных команд - текущего"""
+        command, *args = line.split() or [""]
+        if command.upper() == "NEW":
+            try:
+                m, n, _ = map(int, args)
+            except ValueError:
+                return 0
+            return m * n
+        return 0 if self.game is None else self.game.M * self.game.N
+
+    def handle(self, line):
+        """Выполнение команды, возвращает строки ответа"""
+        command, *args = line.split() or [""]
+        command = command.upper()
+        try:
+            if command == "NEW":
+                m, n, mines = map(int, args)
+                if m < 1 or n < 1 or m * n > MAX_CELLS:
+                    return [f"ERR размер поля от 1x1 до {MAX_CELLS} ячеек"]
+                game = GamePole(m, n, mines)
+                game.init_pole()
+                self.game = game
+                return ["OK"]
+            if command == "QUIT":
+                self.closed = True
+                return ["BYE"]
+            if self.game is None:
+                return ["ERR партия не начата, используйте NEW M N MINES"]
+            if command == "SHOW":
+                return self.game.get_text_pole()
+            if command in ("OPEN", "FLAG"):
+                if self.game.game_over:
+                    return ["ERR партия окончена"]
+                x, y = map(int, args)
+                if command == "FLAG":
+                    self.game.toggle_flag(y, x)
+                    return ["OK"]
+                self.game.open_cell(y, x)
+                if not self.game.game_over:
+                    return ["OK"]
+                return ["WIN" if self.game.win else "BOOM"]
+            return [f"ERR неизвестная команда {command}"]
+        except (ValueError, IndexError) as e:
+            return [f"ERR {e}"]
+
+
+async def serve_client(reader, writer):
+    loop = asyncio.get_running_loop()
+    session = Session()
+    try:
+        while not session.closed:
+            line = await reader.readline()
+            if not line:
+                break
+            line = line.decode(errors="replace")
+            if session.cells(line) >= OFFLOAD_CELLS:
+                reply = await loop.run_in_executor(None, session.handle,
+                                                   line)
+            else:
+                reply = session.handle(line)
+            writer.write(("\n".join(reply + ["."]) + "\n").encode())
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def main(host=HOST, port=PORT):
+    server = await asyncio.start_server(serve_client, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(port=int(sys.argv[1]) if len(sys.argv) > 1 else PORT))
@@ -0,0 +1,264 @@
+"""
+Решатель для игры Сапер.
+По открытым ячейкам поля GamePole находит ячейки, в которых мины точно
+нет или точно есть, и точные вероятности мин в остальных закрытых ячейках:
+- простые правила (число равно 0 или числу закрытых соседей) применяются
+  до тех пор, пока что-то меняется;
+- оставшиеся ограничения делятся на независимые компоненты, в каждой
+  расстановки мин перебираются с запоминанием промежуточных результатов;
+- компоненты и ячейки без ограничений объединяются с учетом общего
+  числа мин на поле.
+Номера ячеек - i * M + j (строка i, столбец j), как в GamePole.
+Запуск: python Minesweeper_solver.py - замер доли выигранных партий
+и времени на ход.
+"""
+import random
+import time
+from math import comb
+from operator import add
+
+from Minesweeper import GamePole, HIDDEN
+
+
+class Analysis:
+    """
+    Результат анализа поля:
+    safe - номера ячеек, в которых мины точно нет;
+    mines - номера ячеек, в которых мина точно есть;
+    probabilities - вероятность мины для каждой закрытой ячейки
+    """
+
+    def __init__(self, safe, mines, probabilities):
+        self.safe = safe
+        self.mines = mines
+        self.probabilities = probabilities
+
+
+def neighbours(idx, m, n):
+    """Номера соседних ячеек на поле m x n"""
+    i, j = divmod(idx, m)
+    return [a * m + b for a in range(max(0, i - 1), min(i + 2, n))
+            for b in range(max(0, j - 1), min(j + 2, m))
+            if a != i or b != j]
+
+
+def analyze(visible, m, n, total_mines):
+    """Анализ видимого состояния поля m x n (GamePole.visible)"""
+    constraints = []
+    for idx, value in enumerate(visible):
+        if value != HIDDEN:
+            closed = [other for other in neighbours(idx, m, n)
+                      if visible[other] == HIDDEN]
+            if closed:
+                constraints.append((closed, value))
+    known = _propagate(constraints)
+    reduced = []
+    for variables, count in constraints:
+        free = [v for v in variables if v not in known]
+        if free:
+            reduced.append((free, count - sum(known.get(v, 0)
+                                              for v in variables)))
+    components = [_enumerate(variables, component)
+                  for variables, component in _components(reduced)]
+
+    frontier = sum(len(counts) for _, counts in components)
+    free_cells = (sum(value == HIDDEN for value in visible) - len(known)
+                  - frontier)
+    mines_left = total_mines - sum(known.values())
+
+    def weight(frontier_mines):
+        rest = mines_left - frontier_mines
+        return comb(free_cells, rest) if 0 <= rest <= free_cells else 0
+
+    polys = [{k: ways for k, (ways, _) in dist.items()}
+             for dist, _ in components]
+    prefix = [{0: 1}]
+    for poly in polys:
+        prefix.append(_multiply(prefix[-1], poly))
+    suffix = [{0: 1}]
+    for poly in reversed(polys):
+        suffix.append(_multiply(suffix[-1], poly))
+    suffix.reverse()
+    total = sum(ways * weight(k) for k, ways in prefix[-1].items())
+    if not total:
+        raise ValueError("Противоречивое состояние поля")
+
+    probabilities = {idx: float(mine) for idx, mine in known.items()}
+    for c, (dist, variables) in enumerate(components):
+        others = _multiply(prefix[c], suffix[c + 1])
+        factors = {k: sum(ways * weight(k + j) for j, ways in others.items())
+                   for k in dist}
+        mines = [0] * len(variables)
+        for k, (_, counts) in dist.items():
+            mines = list(map(add, mines,
+                             (count * factors[k] for count in counts)))
+        for v, count in zip(variables, mines):
+            probabilities[v] = count / total
+    if free_cells:
+        expected = sum(ways * weight(k) * (mines_left - k)
+                       for k, ways in prefix[-1].items())
+        chance = expected / (free_cells * total)
+        for idx, value in enumerate(visible):
+            if value == HIDDEN and idx not in probabilities:
+                probabilities[idx] = chance
+    return Analysis({idx for idx, p in probabilities.items() if p == 0},
+                    {idx for idx, p in probabilities.items() if p == 1},
+                    probabilities)
+
+
+def _propagate(constraints):
+    """Простые правила: если число мин ограничения равно 0 - все его
+    ячейки безопасны, если равно числу ячеек - во всех мины.
+    Возвращает {номер ячейки: 1 - мина, 0 - мины нет}"""
+    by_cell = {}
+    for c, (variables, _) in enumerate(constraints):
+        for v in variables:
+            by_cell.setdefault(v, []).append(c)
+    known = {}
+    queue = list(range(len(constraints)))
+    while queue:
+        variables, count = constraints[queue.pop()]
+        free = [v for v in variables if v not in known]
+        if not free:
+            continue
+        left = count - sum(known.get(v, 0) for v in variables)
+        if left < 0 or left > len(free):
+            raise ValueError("Противоречивое состояние поля")
+        if left in (0, len(free)):
+            for v in free:
+                known[v] = int(left > 0)
+                queue.extend(by_cell[v])
+    return known
+
+
+def _components(constraints):
+    """Разбиение ограничений на независимые компоненты (без общих
+    ячеек). Ячейки компоненты упорядочены обходом в ширину, чтобы
+    одновременно "открытых" ограничений при переборе было немного"""
+    by_cell = {}
+    for c, (variables, _) in enumerate(constraints):
+        for v in variables:
+            by_cell.setdefault(v, []).append(c)
+    seen = set()
+    for start in by_cell:
+        if start in seen:
+            continue
+        seen.add(start)
+        order, used = [start], set()
+        for v in order:
+            for c in by_cell[v]:
+                if c not in used:
+                    used.add(c)
+                    for other in constraints[c][0]:
+                        if other not in seen:
+                            seen.add(other)
+                            order.append(other)
+        yield order, [constraints[c] for c in sorted(used)]
+
+
+def _enumerate(variables, constraints):
+    """Перебор расстановок мин в компоненте с запоминанием: результат
+    для ячеек начиная с i зависит только от i и остатков ограничений,
+    захватывающих ячейки и до i, и после. Сначала прямым проходом
+    находятся достижимые состояния (i, остатки), затем обратным проходом
+    для них считаются результаты - без рекурсии.
+    Возвращает ({число мин: (число расстановок, число расстановок
+    с миной для каждой ячейки)}, ячейки компоненты)"""
+    size = len(variables)
+    position = {v: i for i, v in enumerate(variables)}
+    totals = []
+    occurrences = [[] for _ in range(size)]
+    bounds = []
+    for c, (cells, count) in enumerate(constraints):
+        places = sorted(position[v] for v in cells)
+        totals.append(count)
+        bounds.append((places[0], places[-1]))
+        for k, place in enumerate(places):
+            occurrences[place].append((c, len(places) - k - 1))
+    active = [[c for c, (first, last) in enumerate(bounds)
+               if first < i <= last] for i in range(size + 1)]
+
+    transitions = []
+    states = [()]
+    for i in range(size):
+        touched = {c for c, _ in occurrences[i]}
+        moves = {}
+        following = {}
+        for state in states:
+            residual = dict(zip(active[i], state))
+            options = []
+            for mine in (0, 1):
+                if any(not 0 <= residual.get(c, totals[c]) - mine <= after
+                       for c, after in occurrences[i]):
+                    continue
+                target = tuple(residual.get(c, totals[c])
+                               - (mine if c in touched else 0)
+                               for c in active[i + 1])
+                following[target] = None
+                options.append((mine, target))
+            moves[state] = options
+        transitions.append(moves)
+        states = list(following)
+
+    results = {state: {0: (1, ())} for state in states}
+    for moves in reversed(transitions):
+        level = {}
+        for state, options in moves.items():
+            result = {}
+            for mine, target in options:
+                for k, (ways, counts) in results[target].items():
+                    counts = (ways if mine else 0,) + counts
+                    entry = result.get(k + mine)
+                    if entry is not None:
+                        ways += entry[0]
+                        counts = tuple(map(add, counts, entry[1]))
+                    result[k + mine] = (ways, counts)
+            level[state] = result
+        results = level
+    return results.get((), {}), variables
+
+
+def _multiply(first, second):
+    """Произведение многочленов {степень: коэффициент}"""
+    result = {}
+    for i, a in first.items():
+        for j, b in second.items():
+            result[i + j] = result.get(i + j, 0) + a * b
+    return result
+
+
+def best_move(game):
+    """Следующий ход для поля GamePole: (строка, столбец) ячейки,
+    где мины точно нет, иначе - с наименьшей вероятностью мины"""
+    analysis = analyze(game.visible(), game.M, game.N, game.total_mines)
+    probabilities = analysis.probabilities
+    if analysis.safe:
+        idx = min(analysis.safe)
+    else:
+        idx = min(probabilities, key=lambda i: (probabilities[i], i))
+    return divmod(idx, game.M)
+
+
+def benchmark(games=100, m=9, n=9, total_mines=10, seed=0):
+    """Партии, сыгранные best_move: доля выигранных партий
+    и среднее время выбора хода в миллисекундах"""
+    rng = random.Random(seed)
+    wins = moves = 0
+    elapsed = 0.0
+    for _ in range(games):
+        game = GamePole(m, n, total_mines, rng=rng)
+        game.init_pole()
+        while not game.game_over:
+            start = time.perf_counter()
+            x, y = best_move(game)
+            elapsed += time.perf_counter() - start
+            moves += 1
+            game.open_cell(x, y)
+        wins += game.win
+    return {'games': games, 'solve_rate': wins / games,
+            'ms_per_move': elapsed / moves * 1000}
+
+
+if __name__ == "__main__":
+    for params in ((9, 9, 10), (16, 16, 40), (30, 16, 99)):
+        print(params, benchmark(100, *params))
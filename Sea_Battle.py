@@ -1,7 +1,21 @@
-from copy import deepcopy
-from itertools import product
-from random import randint, choice
-from uuid import uuid4
+import os
+import random
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import count, product
+from struct import Struct
+
+from game_random import make_rng
+
+
+POLE_HEADER = Struct('<HI')
+SHIP_RECORD = Struct('<HHBBB')
+LOG_HEADER = Struct('<4sBHHI')
+TURN_RECORD = Struct('<BHHB')
+GAME_HEADER = Struct('<HBBIIII')
+NO_COORD = 0xFFFF  # координата не задана (корабль не расставлен)
 
 
 class ShipError(Exception):
@@ -10,73 +24,74 @@ class ShipError(Exception):
 
 class Ship:
     """
+    _id - порядковый номер корабля (для сравнения и хеширования);
     _х, _y - координаты начала расположения корабля;
     _length - длина корабля (число палуб: целое значение: 1, 2, 3 или 4);
     _tp - ориентация корабля (1 - горизонтальная; 2 - вертикальная).
     _cells - статус палуб корабля (1 - палуба цела; 2 - палуба подбита).
+    Координаты палуб и клеток вокруг корабля не хранятся,
+    а вычисляются по началу корабля при обращении к ним
     """
+    __slots__ = ('_id', '_x', '_y', '_length', '_tp', '_is_move', '_cells')
+    _ids = count()
+
     def __init__(self, length, tp=1, x=None, y=None):
-        self._id = uuid4()
+        self._id = next(Ship._ids)
         self._x = x
         self._y = y
         self._length = length
         self._tp = tp
         self._is_move = True
-        self._is_alive = True
-        self._cells = [1 for _ in range(length)]
-        self._ship_decks = None
-        self._area = set()
+        self._cells = bytearray([1]) * length
         self.set_start_coord(x, y)
 
     def set_start_coord(self, x, y):
-        """Установка начальных координат, подсчет координат всех палуб
-        и координат, в которых не может быть другого корабля"""
+        """Установка начальных координат корабля"""
         if x is not None and y is not None:
             self._x = x
             self._y = y
-            self.__calculate_ship_decks()
-            self.__calculate_area()
-
-    def __calculate_ship_decks(self):
-        if self._tp == 1:
-            self._ship_decks = list(
-                map(lambda x: (x, self._y),
-                    range(self._x, self._x + self._length))
-            )
-        else:
-            self._ship_decks = list(
-                map(lambda y: (self._x, y),
-                    range(self._y, self._y + self._length))
-            )
-
-    def __calculate_area(self):
-        area = set()
-        for x, y in self._ship_decks:
-            for dx, dy in product((-1, 0, 1), repeat=2):
-                if (x + dx, y + dy) not in self._ship_decks:
-                    area.add((x + dx, y + dy))
-        self._area = area
 
     def get_start_coord(self):
         return self._x, self._y
 
+    def get_end_coord(self):
+        """Координаты последней палубы"""
+        if self._tp == 1:
+            return self._x + self._length - 1, self._y
+        return self._x, self._y + self._length - 1
+
+    def deck_index(self, coord):
+        """Номер палубы, находящейся в клетке coord"""
+        x, y = coord
+        return x - self._x if self._tp == 1 else y - self._y
+
     @property
     def cells(self):
         return self._cells
 
     @property
     def area(self):
-        return self._area
+        """Клетки вокруг корабля, в которых не может быть другого корабля"""
+        if self._x is None:
+            return set()
+        end_x, end_y = self.get_end_coord()
+        return {(x, y) for x in range(self._x - 1, end_x + 2)
+                for y in range(self._y - 1, end_y + 2)
+                if not (self._x <= x <= end_x and self._y <= y <= end_y)}
 
     @property
     def ship_decks(self):
-        return self._ship_decks
+        if self._x is None:
+            return None
+        if self._tp == 1:
+            return [(x, self._y)
+                    for x in range(self._x, self._x + self._length)]
+        return [(self._x, y) for y in range(self._y, self._y + self._length)]
 
     def is_out_pole(self, size=10):
-        if any([x not in range(size)
-                or y not in range(size) for x, y in self._ship_decks]):
-            return True
-        return False
+        end_x, end_y = self.get_end_coord()
+        return not (0 <= self._x and 0 <= self._y
+                    and end_x < size and end_y < size)
 
     def is_collide(self, ship):
         if self.ship_decks is None or ship.ship_decks is None:
@@ -103,7 +118,7 @@ class Ship:
 
     @property
     def is_alive(self):
-        return any(x != 2 for x in self._cells)
+        return 1 in self._cells
 
     def __getitem__(self, item):
         self._check_key(item)
@@ -124,37 +139,188 @@ class Ship:
         return hash(self._id)
 
     def __eq__(self, other):
-        return hash(self) == hash(other)
+        return isinstance(other, Ship) and self._id == other._id
+
+    def snapshot(self):
+        """Состояние корабля в упакованном виде: SHIP_RECORD (x, y,
+        длина, ориентация, флаг движения) и битовая маска подбитых палуб
+        длиной (длина + 7) // 8 байт"""
+        hits = 0
+        for i, deck in enumerate(self._cells):
+            if deck == 2:
+                hits |= 1 << i
+        return SHIP_RECORD.pack(
+            NO_COORD if self._x is None else self._x,
+            NO_COORD if self._y is None else self._y,
+            self._length, self._tp, self._is_move) + hits.to_bytes(
+                (self._length + 7) // 8, 'little')
+
+    def restore(self, data, offset=0):
+        """Восстановление корабля из результата snapshot, записанного
+        в data с позиции offset (номер корабля _id не меняется).
+        Возвращает позицию конца записи"""
+        x, y, length, tp, is_move = SHIP_RECORD.unpack_from(data, offset)
+        offset += SHIP_RECORD.size
+        end = offset + (length + 7) // 8
+        hits = int.from_bytes(data[offset:end], 'little')
+        self._x = None if x == NO_COORD else x
+        self._y = None if y == NO_COORD else y
+        self._length = length
+        self._tp = tp
+        self._is_move = bool(is_move)
+        self._cells = bytearray(2 if hits & (1 << i) else 1
+                                for i in range(length))
+        return end
 
 
 class ShipDefender:
     """Класс Context Manager для безошибочного перемещения кораблей.
-    Не изменяет параметры корабля, если в процессе изменения возникла ошибка"""
+    Не изменяет параметры корабля, если в процессе изменения возникла ошибка:
+    перед изменением сохраняется упакованное состояние корабля
+    (Ship.snapshot), при ошибке корабль восстанавливается из него"""
 
     def __init__(self, ship):
         self._ship = ship
 
     def __enter__(self):
-        self._temp_ship = deepcopy(self._ship)
-        return self._temp_ship
+        self._state = self._ship.snapshot()
+        return self._ship
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is None:
-            self._ship.__dict__ = self._temp_ship.__dict__
+        if exc_type is not None:
+            self._ship.restore(self._state)
         return True
 
 
+class CellSet:
+    """Множество клеток поля size x size в виде битовой маски
+    (1 бит на клетку) - для записи ходов на больших полях"""
+    __slots__ = ('_size', '_bits', '_count')
+
+    def __init__(self, size, cells=()):
+        self._size = size
+        self._bits = bytearray((size * size + 7) // 8)
+        self._count = 0
+        for coord in cells:
+            self.add(coord)
+
+    def __index(self, coord):
+        x, y = coord
+        if 0 <= x < self._size and 0 <= y < self._size:
+            return y * self._size + x
+        return None
+
+    def add(self, coord):
+        idx = self.__index(coord)
+        if idx is None:
+            raise IndexError("Координата выходит за пределы поля")
+        if not self._bits[idx >> 3] & (1 << (idx & 7)):
+            self._bits[idx >> 3] |= 1 << (idx & 7)
+            self._count += 1
+
+    def __contains__(self, coord):
+        idx = self.__index(coord)
+        return idx is not None and bool(self._bits[idx >> 3]
+                                        & (1 << (idx & 7)))
+
+    def __iter__(self):
+        size = self._size
+        for byte_idx, byte in enumerate(self._bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        idx = byte_idx * 8 + bit
+                        yield idx % size, idx // size
+
+    def __len__(self):
+        return self._count
+
+    def snapshot(self):
+        """Битовая маска клеток (1 бит на клетку)"""
+        return bytes(self._bits)
+
+    def restore(self, data, offset=0):
+        """Восстановление множества из результата snapshot"""
+        self._bits[:] = data[offset:offset + len(self._bits)]
+        self._count = int.from_bytes(self._bits, 'little').bit_count()
+
+
+class _Anchors:
+    """Допустимые позиции кораблей длины length для перебора
+    с возвратом: для каждой позиции из _placements - число запрещенных
+    клеток под ней и отметок "уже пробовали"; позиции с нулем хранятся
+    в списке free (и их места в нем - в position) для случайного выбора
+    за O(1)"""
+    __slots__ = ('_size', '_placements', '_covering', '_counts', 'free',
+                 '_position')
+
+    def __init__(self, size, length):
+        self._size = size
+        self._placements = _placements(size, length)
+        self._covering = _covering(size, length)
+        self._counts = [0] * len(self._placements)
+        self.free = list(range(len(self._placements)))
+        self._position = list(range(len(self._placements)))
+
+    def add(self, placement, delta):
+        """Изменение счетчика позиции: позиция допустима, пока он 0"""
+        count = self._counts[placement]
+        self._counts[placement] = count + delta
+        if count == 0:
+            idx, last = self._position[placement], self.free[-1]
+            self.free[idx] = last
+            self._position[last] = idx
+            self.free.pop()
+        elif count + delta == 0:
+            self._position[placement] = len(self.free)
+            self.free.append(placement)
+
+    def cell(self, idx, delta):
+        """Клетка idx стала запрещенной (delta=1) или свободной (-1)"""
+        for placement in self._covering[idx]:
+            self.add(placement, delta)
+
+    def anchor(self, placement):
+        """Ориентация и координаты начала корабля в позиции"""
+        cells = self._placements[placement]
+        tp = 2 if len(cells) > 1 and cells[1] - cells[0] != 1 else 1
+        y, x = divmod(cells[0], self._size)
+        return tp, x, y
+
+
 class GamePole:
     """
     _size - размер игрового поля _size x _size;
     _ships - корабли, находящиеся на поле (объекты класса Ship);
-    __assort_ships - номенклатура кораблей (число кораблей заданной длинны)
+    __assort_ships - номенклатура кораблей (число кораблей заданной длинны);
+    _decks_index - индекс клеток поля: координата палубы -> корабль
+    (номер палубы вычисляется по смещению от начала корабля);
+    _alive - число непотопленных кораблей;
+    _sparse - режим большого поля: корабли расставляются случайным
+    выбором позиции с проверкой по индексу палуб, без просмотра всех клеток
+    (по умолчанию включается для полей больше LARGE_POLE);
+    _placement_attempts - число попыток последней расстановки (проходов
+    перебора с возвратом и случайных позиций в режиме большого поля);
+    _rng - генератор случайных чисел расстановки и движения кораблей
+    (см. make_rng)
     """
     COMMON_ASSORT = ((1, 4), (2, 3), (3, 2), (4, 1))
+    MAX_PLACEMENT_STEPS = 300
+    PLACEMENT_RESTARTS = 100
+    LARGE_POLE = 50
+    SPARSE_ATTEMPTS = 100
+    SPARSE_RESTARTS = 3
+    PLACEMENT_ERROR = ("Не удалось расставить корабли. "
+                       "Измените размер поля или количество кораблей")
 
-    def __init__(self, size, assort_ships=None):
+    def __init__(self, size, assort_ships=None, sparse=None, rng=None):
         self._size = size
+        self._rng = make_rng(rng)
         self._ships = []
+        self._decks_index = {}
+        self._alive = 0
+        self._placement_attempts = 0
+        self._sparse = size > self.LARGE_POLE if sparse is None else sparse
         self.__assort_ships = (self.COMMON_ASSORT if assort_ships is None
                                else assort_ships)
 
@@ -163,54 +329,133 @@ class GamePole:
         self.__placement_ships()
 
     def __create_ships(self):
+        self._ships = []
+        self._decks_index = {}
         for amount, length in self.__assort_ships:
-            self._ships.extend(
-                [Ship(length, tp=randint(1, 2)) for _ in range(amount)])
+            self._ships.extend([Ship(length) for _ in range(amount)])
+        self._alive = len(self._ships)
 
     def __placement_ships(self):
-        """Расстановка кораблей на поле, с учетом ограничений
-        если за 100 попыток поставить корабль не удалось,
-        сбрасываем расставленные корабли и начинаем заново"""
-        try:
-            placed_ships = 0
-            bad_combination = False
-            total_ships = len(self._ships)
-            while placed_ships < total_ships and not bad_combination:
-                for ship in self._ships:
-                    not_placed = True
-                    attempts = 0
-                    while not_placed:
-                        attempts += 1
-                        with ShipDefender(
-                                ship) as s:
-                            x, y = (randint(0, self._size - 1) for _ in 'xy')
-                            s.set_start_coord(x, y)
-                            self.__check_ship_position(s)
-                            not_placed = False
-                            placed_ships += 1
-                        if attempts > 100:
-                            bad_combination = True
-                            break
-                    if bad_combination:
-                        break
-            if bad_combination:
-                self._ships = []
-                self.init()
-        except RecursionError:
-            print("Не удалось расставить корабли. "
-                  "Измените размер поля или количество кораблей")
-
-    def __check_ship_position(self, ship):
-        if ship.is_out_pole(self._size):
-            raise ShipError('корабль за пределами поля')
-        if self.__check_collide(ship):
-            raise ShipError('корабли соприкасаются')
-
-    def __check_collide(self, ship):
-        for other_ship in self._ships:
-            if ship.is_collide(other_ship):
-                return True
-        return False
+        """Расстановка кораблей перебором с возвратом.
+        Для очередного корабля равновероятно выбирается позиция из
+        множества допустимых позиций кораблей его длины (_Anchors),
+        которое обновляется при постановке и снятии кораблей.
+        Если позиций не осталось - возвращаемся к предыдущему кораблю.
+        Перебор ограничен MAX_PLACEMENT_STEPS возвратами
+        и PLACEMENT_RESTARTS перезапусками.
+        Корабль вместе с соседними клетками справа и снизу занимает
+        прямоугольник (длина + 1) x 2 на поле (size + 1) x (size + 1),
+        и такие прямоугольники не пересекаются - если их суммарная площадь
+        больше площади поля, расставить корабли невозможно"""
+        if (sum(2 * (ship._length + 1) for ship in self._ships)
+                > (self._size + 1) ** 2):
+            raise ShipError(self.PLACEMENT_ERROR)
+        self._placement_attempts = 0
+        order = sorted(self._ships, key=lambda ship: -ship._length)
+        if not order:
+            return
+        if self._sparse:
+            for _ in range(self.SPARSE_RESTARTS):
+                self._decks_index = {}
+                if self.__sparse_placement(order):
+                    return
+            if self._size > self.LARGE_POLE:
+                raise ShipError(self.PLACEMENT_ERROR)
+        self._decks_index = {}
+        for _ in range(self.PLACEMENT_RESTARTS):
+            self._placement_attempts += 1
+            placed = self.__search_placement(order)
+            if placed is None:
+                continue
+            if not placed:
+                break
+            for ship in self._ships:
+                self.__register(ship)
+            return
+        raise ShipError(self.PLACEMENT_ERROR)
+
+    def __sparse_placement(self, order):
+        """Расстановка на большом поле: для каждого корабля до
+        SPARSE_ATTEMPTS раз выбирается случайная позиция и проверяется
+        по индексу палуб. Возвращает False, если место найти не удалось.
+        Такая расстановка повторяется до SPARSE_RESTARTS раз; полный
+        перебор после нее выполняется только на полях не больше
+        LARGE_POLE, на больших полях сразу возникает ShipError"""
+        size = self._size
+        for ship in order:
+            length = ship._length
+            for _ in range(self.SPARSE_ATTEMPTS):
+                self._placement_attempts += 1
+                tp = 1 if length == 1 else self._rng.randint(1, 2)
+                x = self._rng.randint(0, size - (length if tp == 1 else 1))
+                y = self._rng.randint(0, size - (1 if tp == 1 else length))
+                ship._tp = tp
+                ship.set_start_coord(x, y)
+                if all(self.__is_free(cell) for cell in ship.ship_decks):
+                    self.__register(ship)
+                    break
+            else:
+                return False
+        return True
+
+    def __search_placement(self, order):
+        """Один проход перебора с возвратом без рекурсии.
+        Опробованная на глубине позиция исключается из позиций этой
+        и следующих глубин до возврата с этой глубины: корабли одной
+        длины взаимозаменяемы, поэтому расстановки с ней уже перебраны.
+        Возвращает True - корабли расставлены, False - расстановка
+        невозможна (перебор исчерпан), None - закончился лимит возвратов"""
+        for ship in order:
+            ship._x = ship._y = None
+        blocked = bytearray(self._size ** 2)
+        anchors = {ship._length: _Anchors(self._size, ship._length)
+                   for ship in order}
+        tried = [[] for _ in order]
+        depth = backtracks = 0
+        while True:
+            ship = order[depth]
+            group = anchors[ship._length]
+            if group.free:
+                placement = group.free[self._rng.randrange(len(group.free))]
+                group.add(placement, 1)
+                tried[depth].append(placement)
+                ship._tp, x, y = group.anchor(placement)
+                ship.set_start_coord(x, y)
+                self.__mark_ship(ship, blocked, 1, anchors)
+                depth += 1
+                if depth == len(order):
+                    return True
+                continue
+            for placement in tried[depth]:
+                group.add(placement, -1)
+            tried[depth] = []
+            depth -= 1
+            if depth < 0:
+                return False
+            backtracks += 1
+            if backtracks > self.MAX_PLACEMENT_STEPS:
+                return None
+            ship = order[depth]
+            self.__mark_ship(ship, blocked, -1, anchors)
+            ship._x = ship._y = None
+
+    def __mark_ship(self, ship, blocked, delta, anchors):
+        """Отмечает (delta=1) или снимает (delta=-1) палубы корабля
+        и клетки вокруг него в массиве запрещенных клеток. Клетки,
+        ставшие запрещенными или свободными, обновляют множества
+        допустимых позиций anchors"""
+        size = self._size
+        for x, y in ship.ship_decks + list(ship.area):
+            if 0 <= x < size and 0 <= y < size:
+                idx = y * size + x
+                blocked[idx] += delta
+                if blocked[idx] == (delta > 0):
+                    for group in anchors.values():
+                        group.cell(idx, delta)
+
+    def __register(self, ship):
+        for coord in ship.ship_decks:
+            self._decks_index[coord] = ship
 
     @property
     def ships(self):
@@ -218,81 +463,659 @@ class GamePole:
 
     def move_ships(self):
         """Перемещаем все корабли, которые могут перемещаться (is_move=True),
-        на 1 ячейку"""
-        for ship in self._ships:
-            step = choice((-1, 1))
-            not_moved = True
-            tries = 0
-            while not_moved and tries < 2:
-                with ShipDefender(ship) as s:
-                    s.move(step)
-                    self.__check_ship_position(s)
-                    not_moved = False
-                step = -step
-                tries += 1
+        на 1 ячейку. Копии кораблей не создаются: новое положение
+        проверяется по индексу палуб, а в индексе меняются только
+        освободившаяся и занятая клетки.
+        Возвращает сдвиги кораблей (0, 1 или -1) в порядке списка ships"""
+        moves = [0] * len(self._ships)
+        for i, ship in enumerate(self._ships):
+            if not ship._is_move:
+                continue
+            step = self._rng.choice((-1, 1))
+            for go in (step, -step):
+                new_deck = self.__free_cell_ahead(ship, go)
+                if new_deck is not None:
+                    self.__shift(ship, go, new_deck)
+                    moves[i] = go
+                    break
+        return moves
+
+    def apply_moves(self, moves):
+        """Повтор сдвигов, возвращенных move_ships (без проверок)"""
+        for ship, go in zip(self._ships, moves):
+            if go:
+                x, y = ship.get_start_coord()
+                offset = ship._length if go == 1 else -1
+                self.__shift(ship, go, (x + offset, y) if ship._tp == 1
+                             else (x, y + offset))
+
+    def __free_cell_ahead(self, ship, go):
+        """Клетка, которую займет корабль при сдвиге на go, если она
+        на поле и рядом с ней нет палуб других кораблей, иначе None.
+        Остальные палубы после сдвига остаются на уже проверенных местах"""
+        x, y = ship.get_start_coord()
+        offset = ship._length if go == 1 else -1
+        cell = (x + offset, y) if ship._tp == 1 else (x, y + offset)
+        return cell if self.__is_free(cell, ship) else None
+
+    def __is_free(self, cell, ship=None):
+        """Клетка на поле и рядом с ней нет палуб других кораблей"""
+        x, y = cell
+        if not (0 <= x < self._size and 0 <= y < self._size):
+            return False
+        for dx, dy in product((-1, 0, 1), repeat=2):
+            other = self._decks_index.get((x + dx, y + dy))
+            if other is not None and other is not ship:
+                return False
+        return True
+
+    def __shift(self, ship, go, new_deck):
+        x, y = ship.get_start_coord()
+        tail = (x, y) if go == 1 else ship.get_end_coord()
+        del self._decks_index[tail]
+        self._decks_index[new_deck] = ship
+        if ship._tp == 1:
+            ship.set_start_coord(x + go, y)
+        else:
+            ship.set_start_coord(x, y + go)
 
     def check_hit(self, coord):
-        for ship in self._ships:
-            if coord in ship.ship_decks:
-                ship._is_move = False
-                idx = ship.ship_decks.index(coord)
-                ship._cells[idx] = 2
-                if ship.is_alive:
-                    return 1, ship
-                else:
-                    return 2, ship
-        return 0, None
+        ship = self._decks_index.get(coord)
+        if ship is None:
+            return 0, None
+        ship._is_move = False
+        idx = ship.deck_index(coord)
+        if ship._cells[idx] == 1:
+            ship._cells[idx] = 2
+            if not ship.is_alive:
+                self._alive -= 1
+        if ship.is_alive:
+            return 1, ship
+        return 2, ship
+
+    @property
+    def alive(self):
+        """Число непотопленных кораблей"""
+        return self._alive
+
+    @property
+    def placement_attempts(self):
+        """Число попыток последней расстановки кораблей"""
+        return self._placement_attempts
+
+    def __getitem__(self, coord):
+        """Состояние клетки поля: 0 - пусто, 1 - палуба цела,
+        2 - палуба подбита"""
+        ship = self._decks_index.get(coord)
+        if ship is None:
+            return 0
+        return ship.cells[ship.deck_index(coord)]
+
+    def snapshot(self):
+        """Состояние поля в упакованном виде: размер, число кораблей
+        и для каждого корабля x, y, длина, ориентация, флаг движения
+        и битовая маска подбитых палуб"""
+        parts = [POLE_HEADER.pack(self._size, len(self._ships))]
+        parts.extend(ship.snapshot() for ship in self._ships)
+        return b''.join(parts)
+
+    def restore(self, data, offset=0):
+        """Восстановление поля из результата snapshot, записанного
+        в data с позиции offset. Возвращает позицию конца записи"""
+        self._size, total = POLE_HEADER.unpack_from(data, offset)
+        offset += POLE_HEADER.size
+        self._ships = []
+        self._decks_index = {}
+        self._alive = 0
+        for _ in range(total):
+            ship = Ship(1)
+            offset = ship.restore(data, offset)
+            self._ships.append(ship)
+            if ship._x is not None:
+                self.__register(ship)
+            self._alive += ship.is_alive
+        return offset
 
     def get_text_pole(self, player_step=None, hidden=False):
         """Представление поля в символьном виде.
         Возвращаем либо поле со всеми кораблями, либо только с подбитыми"""
-        if hidden:
-            pole = [['▓' if x == 2 else '░' for x in row] for row in
-                    self.get_pole()]
-        else:
-            pole = [['░' if x == 0 else '▒' if x == 1 else '▓' for x in row]
-                    for row in self.get_pole()]
-        for x, y in player_step:
-            if pole[y][x] == '░':
-                pole[y][x] = "."
+        pole = [['░'] * self._size for _ in range(self._size)]
+        for x, y in player_step or ():
+            pole[y][x] = "."
+        for (x, y), ship in self._decks_index.items():
+            deck = ship.cells[ship.deck_index((x, y))]
+            if deck == 2:
+                pole[y][x] = '▓'
+            elif not hidden:
+                pole[y][x] = '▒'
         return pole
 
     def get_pole(self):
         """Представление поля в числовом виде"""
         pole = [[0 for _ in range(self._size)] for _ in range(self._size)]
-        for ship in self._ships:
-            for coord, deck in zip(ship.ship_decks, ship.cells):
-                col, row = coord
-                pole[row][col] = deck
+        for (col, row), ship in self._decks_index.items():
+            pole[row][col] = ship.cells[ship.deck_index((col, row))]
         return tuple(map(tuple, pole))
 
     def show(self):
         [print(*line) for line in self.get_pole()]
 
 
+class PoleRenderer:
+    """
+    Вывод двух игровых полей в терминал одной записью в поток.
+    _ansi - режим перерисовки на месте: кадр выводится один раз
+    в верхней части экрана, ниже задается область прокрутки для
+    сообщений, а в следующих кадрах перезаписываются только изменившиеся
+    клетки (позиционирование курсора ANSI-последовательностями);
+    _rows - строки предыдущего кадра (символы клеток обоих полей);
+    _lines - готовые текстовые строки предыдущего кадра: строки полей,
+    которые не изменились, берутся из него, а не форматируются заново
+    """
+    HEADER_LINES = 2
+
+    def __init__(self, size, stream=None, ansi=False):
+        self._size = size
+        self._stream = stream or sys.stdout
+        self._ansi = ansi
+        self._rows = None
+        self._lines = None
+        numbers = ' '.join(map(str, range(size)))
+        self._header = (f"{'Человек':^{size * 2 + 3}} "
+                        f"{'Компьютер':^{size * 2 + 7}}\n"
+                        f"  {numbers}{' ' * 5}  {numbers}\n")
+
+    def render(self, human_pole, pc_pole):
+        rows = [human_row + pc_row
+                for human_row, pc_row in zip(human_pole, pc_pole)]
+        if self._ansi and self._rows is not None:
+            self._stream.write(self.__diff(rows))
+        else:
+            old_rows, old_lines = self._rows, self._lines
+            lines = [old_lines[i]
+                     if old_rows is not None and row == old_rows[i]
+                     else self.__line(i, row) for i, row in enumerate(rows)]
+            frame = self._header + ''.join(lines)
+            if self._ansi:
+                height = shutil.get_terminal_size().lines
+                frame = (f'\033[2J\033[H{frame}'
+                         f'\033[{len(lines) + self.HEADER_LINES + 1};'
+                         f'{height}r\033[{height};1H')
+            self._stream.write(frame)
+            self._lines = lines
+        self._stream.flush()
+        self._rows = rows
+
+    def close(self):
+        """Сброс области прокрутки после игры в режиме ANSI"""
+        if self._ansi and self._rows is not None:
+            self._stream.write('\033[r')
+            self._stream.flush()
+
+    def __line(self, i, row):
+        size = self._size
+        return (f"{i} {' '.join(row[:size])}{' ' * 5}"
+                f"{i} {' '.join(row[size:])}\n")
+
+    def __diff(self, rows):
+        """Перезапись изменившихся клеток с сохранением позиции курсора"""
+        size = self._size
+        out = ['\0337']
+        for i, (row, old) in enumerate(zip(rows, self._rows)):
+            if row == old:
+                continue
+            prefix = len(str(i)) + 1
+            for j, (glyph, old_glyph) in enumerate(zip(row, old)):
+                if glyph != old_glyph:
+                    column = prefix + 2 * j + 1
+                    if j >= size:
+                        column += prefix + 4
+                    out.append(f'\033[{i + self.HEADER_LINES + 1};'
+                               f'{column}H{glyph}')
+        out.append('\0338')
+        return ''.join(out)
+
+
+class GameRecorder:
+    """
+    Запись партии в двоичный поток записями фиксированной длины.
+    Заголовок: сигнатура, версия, размер поля, интервал снимков
+    и число кораблей на поле. Далее каждые interval ходов - снимок обоих
+    полей (GamePole.snapshot) перед ходом, и запись хода: чей выстрел,
+    координаты, результат (0, 1, 2) и сдвиги кораблей обстрелянного поля
+    """
+    MAGIC = b'SBLG'
+    VERSION = 2
+
+    def __init__(self, stream, interval=64):
+        self._stream = stream
+        self._interval = interval
+        self._turn = 0
+
+    def start(self, size, ships):
+        """Заголовок записи: размер поля и число кораблей на поле"""
+        self._stream.write(LOG_HEADER.pack(self.MAGIC, self.VERSION, size,
+                                           self._interval, ships))
+
+    def checkpoint(self, human, pc):
+        """Снимок полей перед ходом, если подошла его очередь"""
+        if self._turn % self._interval == 0:
+            self._stream.write(human.snapshot() + pc.snapshot())
+
+    def record(self, human_turn, coord, hit, moves):
+        self._stream.write(TURN_RECORD.pack(not human_turn, *coord, hit)
+                           + bytes(go & 0xFF for go in moves))
+        self._turn += 1
+
+
+class GameReplayer:
+    """
+    Чтение партии, записанной GameRecorder, из двоичного потока
+    с произвольным доступом: состояние после хода n восстанавливается
+    из ближайшего предыдущего снимка и нескольких записей ходов
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        stream.seek(0)
+        magic, version, self._size, self._interval, ships = (
+            LOG_HEADER.unpack(stream.read(LOG_HEADER.size)))
+        if magic != GameRecorder.MAGIC or version != GameRecorder.VERSION:
+            raise ValueError("Поток не является записью партии")
+        self._ships = ships
+        self._turn_size = TURN_RECORD.size + ships
+        self._snapshot_size = 2 * self.__pole_size(ships)
+        length = stream.seek(0, 2) - LOG_HEADER.size
+        block = self._interval * self._turn_size + self._snapshot_size
+        turns = length // block * self._interval
+        rest = length % block
+        if rest:
+            turns += (rest - self._snapshot_size) // self._turn_size
+        self._turns = turns
+
+    def __pole_size(self, ships):
+        """Длина снимка одного поля - по первому снимку записи (длины
+        кораблей, а значит и длины снимков, в партии не меняются).
+        Маска подбитых палуб корабля длиной до 255 - не больше 32 байт"""
+        self._stream.seek(LOG_HEADER.size)
+        data = self._stream.read(POLE_HEADER.size
+                                 + ships * (SHIP_RECORD.size + 32))
+        if len(data) < POLE_HEADER.size:
+            return POLE_HEADER.size
+        return GamePole(self._size).restore(data)
+
+    @property
+    def turns(self):
+        return self._turns
+
+    def __offset(self, turn):
+        return (LOG_HEADER.size + turn * self._turn_size
+                + (turn // self._interval + 1) * self._snapshot_size)
+
+    def turn(self, n):
+        """Ход n: (выстрел человека, координаты, результат, сдвиги)"""
+        if n not in range(self._turns):
+            raise IndexError("Номер хода вне записанной партии")
+        self._stream.seek(self.__offset(n))
+        data = self._stream.read(self._turn_size)
+        pc_turn, x, y, hit = TURN_RECORD.unpack_from(data)
+        moves = [go - 256 if go > 127 else go
+                 for go in data[TURN_RECORD.size:]]
+        return not pc_turn, (x, y), hit, moves
+
+    def __iter__(self):
+        for n in range(self._turns):
+            yield self.turn(n)
+
+    def state(self, n):
+        """Поля человека и компьютера после n ходов"""
+        if not self._turns or n not in range(self._turns + 1):
+            raise IndexError("Номер хода вне записанной партии")
+        start = min(n, max(self._turns - 1, 0)) // self._interval
+        start *= self._interval
+        self._stream.seek(self.__offset(start) - self._snapshot_size)
+        data = self._stream.read(self._snapshot_size)
+        human, pc = GamePole(self._size), GamePole(self._size)
+        human.restore(data[:self._snapshot_size // 2])
+        pc.restore(data[self._snapshot_size // 2:])
+        for turn in range(start, n):
+            human_turn, coord, hit, moves = self.turn(turn)
+            pole = pc if human_turn else human
+            pole.check_hit(coord)
+            pole.apply_moves(moves)
+        return human, pc
+
+
+class Player:
+    """Стратегия игрока: выбор клетки для выстрела.
+    reset - подготовка к новой игре;
+    choose - выбор клетки по множеству steps (клетки, в которых
+    уже не может быть корабля противника);
+    notify - результат выстрела (0 - мимо, 1 - ранил, 2 - убил)
+    и подбитый корабль. Случайные решения принимаются генератором
+    _rng, который передает игра (см. make_rng)"""
+
+    def reset(self, size, assort=None, rng=None):
+        self._size = size
+        self._rng = make_rng(rng)
+
+    def choose(self, steps):
+        raise NotImplementedError
+
+    def notify(self, coord, hit, ship):
+        pass
+
+
+class HumanPlayer(Player):
+    """Ввод координат выстрела с клавиатуры"""
+
+    def choose(self, steps):
+        coord = None
+        while not coord:
+            coord = self.__input_coord(steps)
+        return coord
+
+    def __input_coord(self, steps):
+        try:
+            print('_' * 50)
+            x, y = map(int, input("Введите координаты (x, y) для выстрела "
+                                  "через пробел: ").split())
+            if x not in range(self._size) or y not in range(self._size):
+                raise IndexError("Координата выходит за пределы поля")
+            if (x, y) in steps:
+                raise IndexError("В этой клетке уже не может быть корабля")
+            return x, y
+        except IndexError as e:
+            print(e)
+        except ValueError:
+            print("Введите 2 числа через пробел в формате: '9 9'")
+
+
+class RandomPlayer(Player):
+    """Выстрел в случайную клетку, где еще может быть корабль"""
+
+    def choose(self, steps):
+        while True:
+            coord = (self._rng.randrange(self._size),
+                     self._rng.randrange(self._size))
+            if coord not in steps:
+                return coord
+
+
+class HunterPlayer(RandomPlayer):
+    """
+    Случайные выстрелы, а после попадания - обстрел соседних клеток,
+    пока корабль не потоплен.
+    _last_step, _first_step, _diff, _next_step - поля для логики выстрелов
+    """
+    DIFF = ((0, 1), (0, -1), (1, 0), (-1, 0))
+
+    def reset(self, size, assort=None, rng=None):
+        super().reset(size, assort, rng)
+        self._last_step = None
+        self._first_step = None
+        self._diff = list(self.DIFF)
+        self._next_step = None
+        self._steps = set()
+
+    def choose(self, steps):
+        self._steps = steps
+        return self._next_step or super().choose(steps)
+
+    def notify(self, coord, hit, ship):
+        """Если результатом выстрела стало попадание и корабль
+        не потоплен, то стреляем вокруг ячейки"""
+        self._next_step = None
+        if hit == 1:
+            if not self._first_step:
+                self._first_step = coord
+            self._last_step = coord
+            self._diff = list(self.DIFF)
+        elif hit == 2:
+            self._last_step = None
+            self._diff = list(self.DIFF)
+            self._first_step = None
+        if self._last_step:
+            while not self._next_step:
+                if not self._diff:
+                    self._diff = list(self.DIFF)
+                    self._last_step = self._first_step
+                diff = self._diff.pop(self._rng.randrange(len(self._diff)))
+                next_step = (diff[0] + self._last_step[0],
+                             diff[1] + self._last_step[1])
+                if next_step not in self._steps and all(
+                        i in range(self._size) for i in next_step):
+                    self._next_step = next_step
+
+
+class DensityPlayer(RandomPlayer):
+    """
+    Выстрел в клетку, которую накрывает наибольший суммарный вес
+    возможных положений оставшихся кораблей (карта плотности).
+    _remaining - число непотопленных кораблей каждой длины;
+    _weights - вес каждого положения корабля данной длины (порядок
+    положений как в _placements). Промах обнуляет веса накрывающих его
+    положений, после каждого выстрела корабли противника сдвигаются
+    на 1 клетку, поэтому веса "растекаются" на соседние положения;
+    _allowed - положения, не задевающие потопленные корабли и клетки
+    вокруг них;
+    _wounded - подбитые палубы непотопленных кораблей и номер выстрела,
+    с которого корабль стоит на месте: пока они есть, стреляем только
+    по положениям, накрывающим эти палубы;
+    _misses - промахи, сделанные после попадания в неподвижный корабль
+    """
+    TARGET_WEIGHT = 50
+    MAX_SIZE = GamePole.LARGE_POLE
+
+    def reset(self, size, assort=None, rng=None):
+        super().reset(size, assort, rng)
+        self._remaining = {}
+        for amount, length in assort or GamePole.COMMON_ASSORT:
+            self._remaining[length] = (self._remaining.get(length, 0)
+                                       + amount)
+        self._weights = {}
+        self._allowed = {}
+        for length, amount in self._remaining.items():
+            total = len(_placements(size, length))
+            self._weights[length] = [amount / total] * total
+            self._allowed[length] = [True] * total
+        self._wounded = {}
+        self._misses = {}
+        self._shot = 0
+
+    def choose(self, steps):
+        heat = self.__target_map() if self._wounded else self.__heat_map()
+        best = max(heat)
+        if best == 0:
+            return super().choose(steps)
+        size = self._size
+        cells = [idx for idx, value in enumerate(heat) if value == best]
+        idx = self._rng.choice(cells)
+        return idx % size, idx // size
+
+    def notify(self, coord, hit, ship):
+        x, y = coord
+        idx = y * self._size + x
+        if hit == 0:
+            self.__exclude({idx})
+            if self._wounded:
+                self._misses[idx] = self._shot
+        elif hit == 1:
+            self._wounded[idx] = self._shot
+        else:
+            self.__sink(ship)
+        self._shot += 1
+        self.__drift()
+
+    def __exclude(self, cells, forbid=False):
+        """Обнуление весов положений, накрывающих клетки cells
+        (forbid=True - такие положения больше невозможны)"""
+        for length, weights in self._weights.items():
+            covering = _covering(self._size, length)
+            allowed = self._allowed[length]
+            for idx in cells:
+                for placement in covering[idx]:
+                    weights[placement] = 0.0
+                    if forbid:
+                        allowed[placement] = False
+
+    def __sink(self, ship):
+        size = self._size
+        blocked = set()
+        for x, y in ship.ship_decks + list(ship.area):
+            if 0 <= x < size and 0 <= y < size:
+                blocked.add(y * size + x)
+        for idx in blocked:
+            self._wounded.pop(idx, None)
+        if not self._wounded:
+            self._misses = {}
+        self._remaining[len(ship.cells)] -= 1
+        self.__exclude(blocked, forbid=True)
+
+    def __drift(self):
+        """Сдвиг кораблей на 1 клетку: вес положения делится поровну
+        между соседними допустимыми положениями на той же линии
+        (у края поля или у потопленного корабля - целиком уходит
+        в единственное соседнее). Затем веса нормируются на число
+        оставшихся кораблей данной длины"""
+        size = self._size
+        for length, weights in self._weights.items():
+            allowed = self._allowed[length]
+            starts = size - length + 1
+            drifted = [0.0] * len(weights)
+            for first in range(0, len(weights), starts):
+                for i in range(first, first + starts):
+                    weight = weights[i]
+                    if not weight:
+                        continue
+                    left = i > first and allowed[i - 1]
+                    right = i + 1 < first + starts and allowed[i + 1]
+                    if left and right:
+                        drifted[i - 1] += weight / 2
+                        drifted[i + 1] += weight / 2
+                    elif left or right:
+                        drifted[i - 1 if left else i + 1] += weight
+                    else:
+                        drifted[i] += weight
+            total = sum(drifted)
+            amount = self._remaining[length]
+            if not total and amount:
+                drifted = [float(flag) for flag in allowed]
+                total = sum(drifted)
+            if total:
+                drifted = [weight * amount / total for weight in drifted]
+            self._weights[length] = drifted
+
+    def __heat_map(self):
+        heat = [0.0] * (self._size ** 2)
+        for length, weights in self._weights.items():
+            for cells, weight in zip(_placements(self._size, length),
+                                     weights):
+                if weight:
+                    for idx in cells:
+                        heat[idx] += weight
+        return heat
+
+    def __target_map(self):
+        """Карта для добивания: подбитый корабль неподвижен, поэтому
+        учитываются все допустимые положения через подбитые палубы,
+        не накрывающие промахи, сделанные после попадания"""
+        heat = [0.0] * (self._size ** 2)
+        wounded, misses = self._wounded, self._misses
+        for length, amount in self._remaining.items():
+            if not amount:
+                continue
+            placements = _placements(self._size, length)
+            for cells, allowed in zip(placements, self._allowed[length]):
+                if not allowed:
+                    continue
+                covered = [wounded[idx] for idx in cells if idx in wounded]
+                if not covered:
+                    continue
+                frozen = min(covered)
+                if any(misses.get(idx, -1) >= frozen for idx in cells):
+                    continue
+                weight = amount * self.TARGET_WEIGHT ** len(covered)
+                for idx in cells:
+                    heat[idx] += weight
+        for idx in wounded:
+            heat[idx] = 0.0
+        return heat
+
+
+@lru_cache(maxsize=None)
+def _placements(size, length):
+    """Все положения корабля длины length на поле size x size:
+    кортежи номеров клеток (y * size + x) вдоль корабля.
+    Положения упорядочены по ориентации, линии и началу корабля"""
+    placements = []
+    for tp in ((1,) if length == 1 else (1, 2)):
+        for line in range(size):
+            for start in range(size - length + 1):
+                if tp == 1:
+                    cells = range(line * size + start,
+                                  line * size + start + length)
+                else:
+                    cells = range(start * size + line,
+                                  (start + length) * size + line, size)
+                placements.append(tuple(cells))
+    return tuple(placements)
+
+
+@lru_cache(maxsize=None)
+def _covering(size, length):
+    """Для каждой клетки поля - номера положений из _placements,
+    накрывающих эту клетку"""
+    covering = [[] for _ in range(size ** 2)]
+    for placement, cells in enumerate(_placements(size, length)):
+        for idx in cells:
+            covering[idx].append(placement)
+    return tuple(map(tuple, covering))
+
+
 class SeaBattle:
     """
     _size - размер игрового поля _size x _size;
     _hidden - флаг, определяющий будут ли скрыты корабли PC на игровом поле;
+    _headless - флаг игры без ввода / вывода в консоль;
     _game_over - флаг окончания игры;
     _human_steps, _pc_steps - поля для записи ходов, в которых уже не может
     быть кораблся противника;
     _human_turn - флаг для обозначения чей сейчас ход;
-    _last_step, _first_step, _diff, _next_step - поля для логики PC;
+    _players - стратегии игроков (по умолчанию человек и компьютер);
+    _stats - статистика выстрелов каждого игрока;
+    _renderer - вывод полей в терминал (ansi=True - перерисовка
+    только изменившихся клеток);
+    _recorder - запись партии в двоичный лог (GameRecorder);
+    _rng - генератор случайных чисел полей и стратегий (см. make_rng):
+    с одинаковым зерном партия ботов повторяется ход в ход
     """
-    def __init__(self, size=10, hidden=True, assort=None):
+    def __init__(self, size=10, hidden=True, assort=None, human=None,
+                 pc=None, headless=False, ansi=False, recorder=None,
+                 rng=None):
         self._size = size
+        self._rng = make_rng(rng)
         self.__game_over = False
         self._hidden = hidden
-        self._human, self._pc = (GamePole(size, assort) for _ in "12")
+        self._headless = headless
+        self._renderer = PoleRenderer(size, ansi=ansi)
+        self._human, self._pc = (GamePole(size, assort, rng=self._rng)
+                                 for _ in "12")
         self._human.init(), self._pc.init()
-        self._human_steps = set()
-        self._pc_steps = set()
+        self._human_steps = CellSet(size)
+        self._pc_steps = CellSet(size)
         self._human_turn = True
-        self._last_step = None
-        self._first_step = None
-        self._diff = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-        self._next_step = None
+        self._players = {True: human or HumanPlayer(),
+                         False: pc or (DensityPlayer()
+                                       if size <= DensityPlayer.MAX_SIZE
+                                       else HunterPlayer())}
+        for player in self._players.values():
+            player.reset(size, assort, self._rng)
+        self._stats = {True: {'shots': 0, 'hits': 0},
+                       False: {'shots': 0, 'hits': 0}}
+        self._recorder = recorder
+        if recorder:
+            recorder.start(size, len(self._human.ships))
 
     def next_move(self):
         if self._human_turn:
@@ -300,103 +1123,157 @@ class SeaBattle:
         else:
             self.pc_hit()
 
-    def human_hit(self):
-        coord = None
-        while not coord:
-            coord = self.__input_coord()
-        self.__hit(coord)
+    def human_hit(self, coord=None):
+        hit = self.__turn(self._human_turn, coord)
         if not self.__is_any_alive(self._pc):
             self.__game_over = True
-            print('_' * 50)
-            print("\033[3;32m Поздравляем, вы победили!!! \033[0m")
-
-    def __input_coord(self):
-        try:
-            print('_' * 50)
-            x, y = map(int, input("Введите координаты (x, y) для выстрела "
-                                  "через пробел: ").split())
-            if x not in range(self._size) or y not in range(self._size):
-                raise IndexError("Координата выходит за пределы поля")
-            if (x, y) in self._human_steps:
-                raise IndexError("В этой клетке уже не может быть корабля")
-            return x, y
-        except IndexError as e:
-            print(e)
-        except ValueError:
-            print("Введите 2 числа через пробел в формате: '9 9'")
+            self._renderer.close()
+            self.__print('_' * 50)
+            self.__print("\033[3;32m Поздравляем, вы победили!!! \033[0m")
+        return hit
 
     def pc_hit(self):
-        coord = self._next_step
-        while not coord:
-            x, y = (randint(0, self._size - 1) for _ in "xy")
-            if (x, y) not in self._pc_steps:
-                coord = x, y
-        hit = self.__hit(coord)
-        self.__pc_logic(hit, coord)
-
+        self.__turn(self._human_turn)
         if not self.__is_any_alive(self._human):
             self.__game_over = True
-            print('_' * 50)
-            print("\033[3;35m Сожалеем, победил компьютер. \033[0m")
+            self._renderer.close()
+            self.__print('_' * 50)
+            self.__print("\033[3;35m Сожалеем, победил компьютер. \033[0m")
+
+    def __turn(self, human, coord=None):
+        player = self._players[human]
+        steps = self._human_steps if human else self._pc_steps
+        if coord is None:
+            coord = player.choose(steps)
+        hit, ship = self.__hit(coord)
+        player.notify(coord, hit, ship)
+        return hit
+
+    def shoot(self, coord):
+        """Выстрел человека в клетку coord без ввода с клавиатуры
+        (для программного управления игрой). После промаха компьютер
+        делает свои ходы, пока снова не наступит ход человека.
+        Клетки, в которых уже не может быть корабля (подбитые палубы
+        и клетки вокруг потопленных кораблей), не принимаются.
+        Возвращает результат выстрела (0 - мимо, 1 - ранил, 2 - убил)"""
+        x, y = coord
+        if x not in range(self._size) or y not in range(self._size):
+            raise IndexError("Координата выходит за пределы поля")
+        if (x, y) in self._human_steps:
+            raise IndexError("В этой клетке уже не может быть корабля")
+        if self.__game_over or not self._human_turn:
+            raise ShipError("Сейчас не ход человека")
+        hit = self.human_hit(coord)
+        while not self.__game_over and not self._human_turn:
+            self.pc_hit()
+        return hit
+
+    def observation(self):
+        """Поле компьютера глазами человека - байт на клетку
+        (y * size + x): 0 - неизвестно, 1 - корабля нет,
+        2 - подбитая палуба"""
+        size = self._size
+        view = bytearray(size * size)
+        for x, y in self._human_steps:
+            view[y * size + x] = 2 if self._pc[x, y] == 2 else 1
+        return bytes(view)
+
+    def snapshot(self):
+        """Состояние партии в упакованном виде: заголовок GAME_HEADER
+        (размер, чей ход, конец игры, выстрелы и попадания игроков),
+        поля человека и компьютера (GamePole.snapshot) и битовые маски
+        ходов (CellSet.snapshot). Внутреннее состояние стратегий
+        и генератора случайных чисел не сохраняется"""
+        human, pc = self._stats[True], self._stats[False]
+        return b''.join((
+            GAME_HEADER.pack(self._size, self._human_turn, self.__game_over,
+                             human['shots'], human['hits'],
+                             pc['shots'], pc['hits']),
+            self._human.snapshot(), self._pc.snapshot(),
+            self._human_steps.snapshot(), self._pc_steps.snapshot()))
+
+    def restore(self, data):
+        """Восстановление партии из результата snapshot"""
+        (size, human_turn, game_over, human_shots, human_hits,
+         pc_shots, pc_hits) = GAME_HEADER.unpack_from(data)
+        if size != self._size:
+            raise ValueError("Размер поля снимка не совпадает с размером "
+                             "поля игры")
+        offset = self._human.restore(data, GAME_HEADER.size)
+        offset = self._pc.restore(data, offset)
+        self._human_steps.restore(data, offset)
+        self._pc_steps.restore(data, offset + (size * size + 7) // 8)
+        self._human_turn = bool(human_turn)
+        self.__game_over = bool(game_over)
+        self._stats = {True: {'shots': human_shots, 'hits': human_hits},
+                       False: {'shots': pc_shots, 'hits': pc_hits}}
 
     def __hit(self, coord):
-        print('_' * 50)
+        self.__print('_' * 50)
         hit_text = {0: 'Промахнулся', 1: 'Ранил', 2: 'Убил'}
         hit_pole = self._pc if self._human_turn else self._human
         steps = self._human_steps if self._human_turn else self._pc_steps
+        if self._recorder:
+            self._recorder.checkpoint(self._human, self._pc)
         hit_result, ship = hit_pole.check_hit(coord)
+        stats = self._stats[self._human_turn]
+        stats['shots'] += 1
         if hit_result != 0:
+            stats['hits'] += 1
             steps.add(coord)
             if hit_result == 2:
                 for x, y in ship.area:
                     if 0 <= x < self._size and 0 <= y < self._size:
                         steps.add((x, y))
-        print(f'{"Человек" if self._human_turn else "Компьютер"} произвел '
-              f'выстрел в {coord} и', hit_text.get(hit_result))
-        print('_' * 50)
-        hit_pole.move_ships()
+        self.__print(f'{"Человек" if self._human_turn else "Компьютер"} '
+                     f'произвел выстрел в {coord} и',
+                     hit_text.get(hit_result))
+        self.__print('_' * 50)
+        moves = hit_pole.move_ships()
+        if self._recorder:
+            self._recorder.record(self._human_turn, coord, hit_result, moves)
         self.show_pole()
         if hit_result == 0:
             self._human_turn = not self._human_turn
-        return hit_result
+        return hit_result, ship
 
-    def __pc_logic(self, hit, coord):
-        """Логика для выстрелов компьютера: если резаультатом выстрела стало
-        попадание и корабль не потоплен, то стреляем вокруг ячейки"""
-        self._next_step = None
-        if hit == 1:
-            if not self._first_step:
-                self._first_step = coord
-            self._last_step = coord
-            self._diff = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-        elif hit == 2:
-            self._last_step = None
-            self._diff = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-            self._first_step = None
-        if self._last_step:
-            while not self._next_step:
-                if not self._diff:
-                    self._diff = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-                    self._last_step = self._first_step
-                diff = self._diff.pop(randint(0, len(self._diff) - 1))
-                next_step = (diff[0] + self._last_step[0],
-                             diff[1] + self._last_step[1])
-                if next_step not in self._pc_steps and all(
-                        i in range(self._size) for i in next_step):
-                    self._next_step = next_step
+    def __print(self, *args):
+        if not self._headless:
+            print(*args)
 
     def show_pole(self):
         """Отображение игровых полей"""
+        if self._headless:
+            return
         human_pole = self._human.get_text_pole(player_step=self._pc_steps)
         pc_pole = self._pc.get_text_pole(player_step=self._human_steps,
                                          hidden=self._hidden)
-        print(f"{'Человек':^{self._size * 2 + 3}} "
-              f"{'Компьютер':^{self._size * 2 + 7}}")
-        print(' ', *[i for i in range(self._size)], sep=' ', end=' ' * 5)
-        print(' ', *[i for i in range(self._size)], sep=' ')
-        for i in range(self._size):
-            print(i, *human_pole[i], end=' ' * 5)
-            print(i, *pc_pole[i])
+        self._renderer.render(human_pole, pc_pole)
+
+    def play(self):
+        """Игра до конца без участия человека (для стратегий-ботов).
+        Возвращает статистику игры"""
+        while not self.__game_over:
+            self.next_move()
+        return self.stats
+
+    @property
+    def stats(self):
+        """Статистика игры: победитель, выстрелы, попадания, доля попаданий
+        и число ходов, которые пережил флот каждого игрока"""
+        result = {'winner': None, 'turns': 0}
+        if self.__game_over:
+            result['winner'] = ('human' if self.__is_any_alive(self._human)
+                                else 'pc')
+        for human, name in ((True, 'human'), (False, 'pc')):
+            shots = self._stats[human]['shots']
+            hits = self._stats[human]['hits']
+            result[name] = {
+                'shots': shots, 'hits': hits,
+                'hit_ratio': hits / shots if shots else 0.0,
+                'moves_survived': self._stats[not human]['shots']}
+            result['turns'] += shots
+        return result
 
     @property
     def game_over(self):
@@ -405,12 +1282,66 @@ class SeaBattle:
     @staticmethod
     def __is_any_alive(pole):
         """Проверка на наличие непотопленных кораблей на поле"""
-        return any(ship.is_alive for ship in pole.ships)
+        return pole.alive > 0
+
+
+def _play_seeded(task):
+    """Одна партия без вывода (выполняется в процессе пула)"""
+    game_seed, size, assort, players, log_dir = task
+    if log_dir is None:
+        game = SeaBattle(size, assort=assort, human=players[0](),
+                         pc=players[1](), headless=True, rng=game_seed)
+        stats = game.play()
+    else:
+        path = os.path.join(log_dir, f'{game_seed}.sblog')
+        with open(path, 'wb') as stream:
+            game = SeaBattle(size, assort=assort, human=players[0](),
+                             pc=players[1](), headless=True,
+                             recorder=GameRecorder(stream), rng=game_seed)
+            stats = game.play()
+    stats['seed'] = game_seed
+    return stats
+
+
+def simulate(games, first_seed=0, size=10, assort=None,
+             players=(HunterPlayer, HunterPlayer), workers=None,
+             chunksize=64, log_dir=None):
+    """Пакетный прогон games партий между стратегиями players
+    (классы игроков для поля человека и поля компьютера).
+    Партия i играется с зерном first_seed + i, партии распределяются
+    по пулу процессов (workers=1 - без пула). Если задан log_dir,
+    каждая партия записывается в файл <зерно>.sblog (GameRecorder).
+    Возвращает список статистик партий"""
+    tasks = ((first_seed + i, size, assort, players, log_dir)
+             for i in range(games))
+    if workers == 1:
+        return list(map(_play_seeded, tasks))
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_play_seeded, tasks, chunksize=chunksize))
+
+
+def summarize(results):
+    """Сводная статистика пакета партий"""
+    summary = {'games': len(results)}
+    for name in ('human', 'pc'):
+        won = [r for r in results if r['winner'] == name]
+        shots = sum(r[name]['shots'] for r in results)
+        hits = sum(r[name]['hits'] for r in results)
+        summary[name] = {
+            'wins': len(won),
+            'win_rate': len(won) / len(results) if results else 0.0,
+            'shots_to_win': (sum(r[name]['shots'] for r in won) / len(won)
+                             if won else None),
+            'hit_ratio': hits / shots if shots else 0.0,
+            'moves_survived': (sum(r[name]['moves_survived']
+                                   for r in results) / len(results)
+                               if results else 0.0)}
+    return summary
 
 
 if __name__ == "__main__":
     # battle = SeaBattle(10, False, ((2, 4), (3, 3), (3, 2), (4, 1)))
-    battle = SeaBattle(randint(7, 10))
+    battle = SeaBattle(random.randint(7, 10))
     battle.show_pole()
     while not battle.game_over:
         battle.next_move()
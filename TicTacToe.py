@@ -1,4 +1,29 @@
+import math
+import os
 import random
+import time
+from functools import lru_cache
+from multiprocessing import Pipe, Process
+from struct import Struct
+
+from game_random import make_rng
+
+# Линии выигрыша: номера клеток (row * 3 + column)
+LINES = ((0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8),
+         (0, 4, 8), (2, 4, 6))
+# 8 симметрий поля (повороты и отражения): клетка k нового поля -
+# клетка symmetry[k] исходного
+ROTATION = (6, 3, 0, 7, 4, 1, 8, 5, 2)
+REFLECTION = (2, 1, 0, 5, 4, 3, 8, 7, 6)
+SYMMETRIES = []
+for _transform in ((0, 1, 2, 3, 4, 5, 6, 7, 8), REFLECTION):
+    for _ in range(4):
+        SYMMETRIES.append(_transform)
+        _transform = tuple(_transform[k] for k in ROTATION)
+NO_MOVE = 255  # в таблице: позиция окончена или недостижима
+# Заголовок снимка игры: строки, столбцы, длина линии, ход человека,
+# победитель (0 - нет); за ним - маски крестиков и ноликов
+SNAPSHOT_HEADER = Struct('<HHHBB')
 
 
 class Cell:
@@ -15,14 +40,78 @@ class Cell:
         super().__setattr__(key, value)
 
 
+class Geometry:
+    """Битовые маски поля rows x columns (бит клетки - row * columns +
+    column) для линий из k клеток подряд:
+    masks - все такие отрезки по горизонтали, вертикали и диагоналям;
+    lines - для каждой клетки отрезки, проходящие через нее;
+    full - все клетки поля"""
+    DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+    def __init__(self, rows, columns, k):
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.full = (1 << rows * columns) - 1
+        self.masks = []
+        self.lines = [[] for _ in range(rows * columns)]
+        for row in range(rows):
+            for column in range(columns):
+                for dr, dc in self.DIRECTIONS:
+                    cells = [(row + i * dr) * columns + column + i * dc
+                             for i in range(k)
+                             if 0 <= row + i * dr < rows
+                             and 0 <= column + i * dc < columns]
+                    if len(cells) < k or (k == 1 and (dr, dc) != (0, 1)):
+                        continue
+                    mask = sum(1 << cell for cell in cells)
+                    self.masks.append(mask)
+                    for cell in cells:
+                        self.lines[cell].append(mask)
+
+
+@lru_cache(maxsize=None)
+def geometry(rows, columns, k):
+    """Маски поля (Geometry), общие для всех игр одного размера"""
+    return Geometry(rows, columns, k)
+
+
+def free_cells(free):
+    """Номера установленных битов маски free (младший бит - x & -x)"""
+    while free:
+        low = free & -free
+        yield low.bit_length() - 1
+        free ^= low
+
+
 class TicTacToe:
+    """Поле rows x columns, выигрывает тот, кто первым поставит k своих
+    значков подряд по горизонтали, вертикали или диагонали.
+    Поле хранится двумя битовыми масками (masks[0] - крестики,
+    masks[1] - нолики). Выигрыш проверяется только по маскам линий
+    через последний ход, победитель запоминается.
+    rng - генератор случайных чисел find_empty_cell (см. make_rng)"""
     FREE_CELL = 0  # свободная клетка
     HUMAN_X = 1  # крестик (игрок - человек)
     COMPUTER_O = 2  # нолик (игрок - компьютер)
 
-    def __init__(self, human_turn=True):
-        self.pole = [[Cell() for _ in range(3)] for _ in range(3)]
+    def __init__(self, human_turn=True, computer=None, rows=3, columns=3,
+                 k=3, rng=None):
+        if rows < 1 or columns < 1 or not 1 <= k <= max(rows, columns):
+            raise ValueError('некорректные размеры поля или длина линии')
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.geometry = geometry(rows, columns, k)
+        self.masks = [0, 0]
         self.human_turn = human_turn
+        self.rng = make_rng(rng)
+        self.__own_computer = computer is None
+        if computer is None:
+            computer = (PerfectPlayer() if (rows, columns, k) == (3, 3, 3)
+                        else MCTSPlayer(rng=self.rng))
+        self.computer = computer
+        self.__winner = None
 
     def start_game(self):
         while self:
@@ -39,6 +128,8 @@ class TicTacToe:
             print("К сожалению вы проиграли, попробуйте еще раз")
         if self.is_draw:
             print("Игра закончена. Ничья.")
+        if self.__own_computer and isinstance(self.computer, MCTSPlayer):
+            self.computer.close()
 
     def next_step(self):
         if self.human_turn:
@@ -53,53 +144,120 @@ class TicTacToe:
         self[row, column] = self.HUMAN_X
 
     def computer_go(self):
-        row, column = self.find_empty_cell()
+        row, column = self.computer.choose(self, self.COMPUTER_O)
         self[row, column] = self.COMPUTER_O
 
+    @property
+    def free(self):
+        """Маска свободных клеток"""
+        return self.geometry.full & ~(self.masks[0] | self.masks[1])
+
     def find_empty_cell(self):
-        row = random.randint(0, 2)
-        column = random.randint(0, 2)
-        while not self.pole[row][column]:
-            row = random.randint(0, 2)
-            column = random.randint(0, 2)
-        return row, column
+        return divmod(self.rng.choice(list(free_cells(self.free))),
+                      self.columns)
+
+    @property
+    def pole(self):
+        """Поле в виде строк клеток Cell (копия, для совместимости)"""
+        pole = [[Cell() for _ in range(self.columns)]
+                for _ in range(self.rows)]
+        for value in (self.HUMAN_X, self.COMPUTER_O):
+            for cell in free_cells(self.masks[value - 1]):
+                row, column = divmod(cell, self.columns)
+                pole[row][column].value = value
+        return pole
 
     def __getitem__(self, item):
         row, column = item
-        self._check_index(row, column)
-        return self.pole[row][column].value
+        bit = 1 << self.__cell(row, column)
+        if self.masks[0] & bit:
+            return self.HUMAN_X
+        if self.masks[1] & bit:
+            return self.COMPUTER_O
+        return self.FREE_CELL
 
     def __setitem__(self, key, value):
         row, column = key
+        cell = self.__cell(row, column)
+        bit = 1 << cell
+        if value == self.FREE_CELL:
+            if (self.masks[0] | self.masks[1]) & bit:
+                self.masks = [mask & ~bit for mask in self.masks]
+                self.__winner = self.__find_winner()
+            return
+        if value not in (self.HUMAN_X, self.COMPUTER_O):
+            raise ValueError('некорректное значение клетки')
+        if (self.masks[0] | self.masks[1]) & bit:
+            raise ValueError('клетка уже занята')
+        mask = self.masks[value - 1] | bit
+        self.masks[value - 1] = mask
+        if self.__winner is None and any(mask & line == line for line
+                                         in self.geometry.lines[cell]):
+            self.__winner = value
+
+    def __cell(self, row, column):
+        """Номер бита клетки (отрицательные индексы - с конца)"""
         self._check_index(row, column)
-        self.pole[row][column].value = value
+        return row % self.rows * self.columns + column % self.columns
 
-    @staticmethod
-    def _check_index(row, column):
-        if abs(row) not in range(3) or abs(column) not in range(3):
+    def _check_index(self, row, column):
+        if (row not in range(-self.rows, self.rows)
+                or column not in range(-self.columns, self.columns)):
             raise IndexError('некорректно указанные индексы')
 
+    def __find_winner(self):
+        """Поиск победителя по всем маскам линий (после очистки клетки)"""
+        for value in (self.HUMAN_X, self.COMPUTER_O):
+            mask = self.masks[value - 1]
+            if any(mask & line == line for line in self.geometry.masks):
+                return value
+        return None
+
+    def snapshot(self):
+        """Состояние игры в упакованном виде: заголовок SNAPSHOT_HEADER
+        и маски крестиков и ноликов по (rows * columns + 7) // 8 байт"""
+        width = (self.rows * self.columns + 7) // 8
+        return SNAPSHOT_HEADER.pack(
+            self.rows, self.columns, self.k, self.human_turn,
+            self.__winner or 0) + b''.join(mask.to_bytes(width, 'little')
+                                           for mask in self.masks)
+
+    def restore(self, data):
+        """Восстановление игры из результата snapshot"""
+        rows, columns, k, human_turn, winner = (
+            SNAPSHOT_HEADER.unpack_from(data))
+        width = (rows * columns + 7) // 8
+        start = SNAPSHOT_HEADER.size
+        if len(data) != start + 2 * width:
+            raise ValueError('некорректный снимок игры')
+        self.rows, self.columns, self.k = rows, columns, k
+        self.geometry = geometry(rows, columns, k)
+        self.masks = [int.from_bytes(data[start:start + width], 'little'),
+                      int.from_bytes(data[start + width:], 'little')]
+        self.human_turn = bool(human_turn)
+        self.__winner = winner or None
+
     def show(self):
         print("_" * 30)
         dict_char = {self.FREE_CELL: '.', self.HUMAN_X: 'X',
                      self.COMPUTER_O: 'O'}
-        for row in self.pole:
-            for cell in row:
-                print(dict_char[cell.value], end=' ')
+        for row in range(self.rows):
+            for column in range(self.columns):
+                print(dict_char[self[row, column]], end=' ')
             print()
 
     def check_win(self, value):
-        for row in self.pole:
-            if all(cell.value == value for cell in row):
-                return True
-        for i in range(3):
-            if all(cell.value == value for cell
-                   in (row[i] for row in self.pole)):
-                return True
-        if (all(self[i, i] == value for i in range(3))
-                or all(self[i, -1 - i] == value for i in range(3))):
-            return True
-        return False
+        return self.__winner == value
+
+    @property
+    def winner(self):
+        """Значок победителя или None"""
+        return self.__winner
+
+    @property
+    def moves(self):
+        """Число занятых клеток"""
+        return (self.masks[0] | self.masks[1]).bit_count()
 
     @property
     def is_human_win(self):
@@ -111,13 +269,397 @@ class TicTacToe:
 
     @property
     def is_draw(self):
-        return (not self.is_human_win and not self.is_computer_win
-                and not bool(self))
+        return self.__winner is None and not self.free
 
     def __bool__(self):
-        return (not self.is_human_win and not self.is_computer_win
-                and any([cell.value == self.FREE_CELL for rows in self.pole
-                         for cell in rows]))
+        return self.__winner is None and bool(self.free)
+
+
+class Player:
+    """Стратегия компьютера.
+    move - номер клетки (row * columns + column) для хода по маскам
+    своих (own) и чужих (other) значков на поле geometry;
+    choose - клетка (row, column) для хода значком mark на поле game"""
+
+    def choose(self, game, mark):
+        cell = self.move(game.masks[mark - 1], game.masks[2 - mark],
+                         game.geometry)
+        return divmod(cell, game.columns)
+
+    def move(self, own, other, geometry):
+        raise NotImplementedError
+
+
+class RandomPlayer(Player):
+    """Ход в случайную свободную клетку (rng - см. make_rng)"""
+
+    def __init__(self, rng=None):
+        self.rng = make_rng(rng)
+
+    def move(self, own, other, geometry):
+        return self.rng.choice(list(free_cells(geometry.full
+                                               & ~(own | other))))
+
+
+class PerfectPlayer(Player):
+    """Безошибочная игра: ход берется из таблицы perfect_table
+    по номеру позиции за O(1). Таблица строится один раз при первом
+    ходе; если задан path, она сохраняется в файл и в следующий раз
+    загружается из него"""
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def move(self, own, other, geometry):
+        if (geometry.rows, geometry.columns, geometry.k) != (3, 3, 3):
+            raise ValueError('таблица ходов есть только для поля 3x3')
+        index = 0
+        for cell in reversed(range(9)):
+            bit = 1 << cell
+            index = index * 3 + (1 if own & bit else 2 if other & bit else 0)
+        return perfect_table(self.path)[index] % 9
+
+
+class MCTSPlayer(Player):
+    """Поиск по дереву методом Монте-Карло (UCT) для больших полей.
+    На ход отводится time_limit секунд или, если задано, playouts
+    случайных доигрываний. При workers > 1 (None - по числу ядер) поиск
+    идет независимо в нескольких процессах, каждый со своим деревом,
+    и числа посещений ходов из корня складываются. Деревья сохраняются
+    между ходами: корнем становится позиция после двух сделанных ходов.
+    rng - генератор случайных чисел поиска (см. make_rng), процессы
+    получают зерна своих генераторов от него.
+    Процессы останавливает close(); он же вызывается при выходе из блока
+    with и при удалении игрока, а процесс, соединение с которым
+    закрыто, завершается сам"""
+
+    def __init__(self, time_limit=0.2, playouts=None, workers=None,
+                 exploration=1.4, rng=None):
+        self.time_limit = time_limit
+        self.playouts = playouts
+        self.workers = workers or os.cpu_count() or 1
+        self.exploration = exploration
+        self.rng = make_rng(rng)
+        self.__tree = _Tree(exploration, self.rng)
+        self.__connections = []
+
+    def move(self, own, other, geometry):
+        playouts = (None if self.playouts is None
+                    else -(-self.playouts // self.workers))
+        task = (own, other, geometry.rows, geometry.columns, geometry.k,
+                playouts, self.time_limit)
+        if self.workers == 1:
+            visits = self.__tree.search(*task)
+        else:
+            if not self.__connections:
+                self.__start()
+            for connection in self.__connections:
+                connection.send(task)
+            visits = {}
+            for connection in self.__connections:
+                for cell, count in connection.recv().items():
+                    visits[cell] = visits.get(cell, 0) + count
+        return max(visits, key=visits.get)
+
+    def __start(self):
+        for _ in range(self.workers):
+            connection, child = Pipe()
+            Process(target=_mcts_worker,
+                    args=(child, connection, self.exploration,
+                          self.rng.getrandbits(64)),
+                    daemon=True).start()
+            child.close()
+            self.__connections.append(connection)
+
+    def close(self):
+        """Остановка процессов поиска"""
+        connections, self.__connections = self.__connections, []
+        for connection in connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+def self_play(games, x_player=None, o_player=None, rows=3, columns=3, k=3,
+              seed=None):
+    """Пакет из games партий x_player (крестики, ходят первыми) против
+    o_player (по умолчанию - RandomPlayer).
+    Доски всех партий хранятся еще и "срезами": для каждой клетки -
+    целое число, бит g которого - значок в партии g, поэтому выигрыш
+    после хода проверяется сразу во всех партиях несколькими AND
+    по линиям. seed - зерно генератора игроков по умолчанию.
+    Возвращает доли выигрышей, ничьих и проигрышей крестиков"""
+    rng = make_rng(seed)
+    field = geometry(rows, columns, k)
+    players = (x_player or RandomPlayer(rng), o_player or RandomPlayer(rng))
+    lines = [list(free_cells(mask)) for mask in field.masks]
+    slices = ([0] * (rows * columns), [0] * (rows * columns))
+    boards = [[0, 0] for _ in range(games)]
+    active = (1 << games) - 1
+    won = [0, 0]
+    for step in range(rows * columns):
+        side = step % 2
+        player, own = players[side], slices[side]
+        for game in free_cells(active):
+            board = boards[game]
+            cell = player.move(board[side], board[1 - side], field)
+            board[side] |= 1 << cell
+            own[cell] |= 1 << game
+        wins = 0
+        for line in lines:
+            mask = active
+            for cell in line:
+                mask &= own[cell]
+            wins |= mask
+        won[side] |= wins
+        active &= ~wins
+        if not active:
+            break
+    x_wins, o_wins = won[0].bit_count(), won[1].bit_count()
+    return {'games': games, 'win_rate': x_wins / games,
+            'draw_rate': (games - x_wins - o_wins) / games,
+            'loss_rate': o_wins / games}
+
+
+def _index(board):
+    """Номер позиции в таблице: клетки - цифры в троичной записи"""
+    index = 0
+    for value in reversed(board):
+        index = index * 3 + value
+    return index
+
+
+def _canonical(board):
+    """Номер позиции, наименьший среди 8 симметричных ей"""
+    return min(_index([board[k] for k in symmetry])
+               for symmetry in SYMMETRIES)
+
+
+def _is_win(board, value):
+    return any(all(board[k] == value for k in line) for line in LINES)
+
+
+def _after(board, move):
+    """Позиция после хода move с точки зрения соперника: клетки
+    ходящего и соперника меняются местами"""
+    return tuple(2 if k == move else (0, 2, 1)[value]
+                 for k, value in enumerate(board))
+
+
+def _negamax(board, alpha, beta, table):
+    """Оценка позиции для ходящего (1 - выигрыш, 0 - ничья,
+    -1 - проигрыш) перебором с альфа-бета отсечением.
+    board - 9 клеток: 0 - свободна, 1 - ходящий, 2 - соперник.
+    table - таблица транспозиций по каноническому номеру позиции:
+    (оценка, -1 / 0 / 1 - оценка сверху / точная / снизу)"""
+    if _is_win(board, 2):
+        return -1
+    if 0 not in board:
+        return 0
+    key = _canonical(board)
+    if key in table:
+        value, bound = table[key]
+        if (bound == 0 or bound < 0 and value <= alpha
+                or bound > 0 and value >= beta):
+            return value
+    start = alpha
+    best = -2
+    for move in range(9):
+        if board[move] == 0:
+            best = max(best, -_negamax(_after(board, move), -beta, -alpha,
+                                       table))
+            alpha = max(alpha, best)
+            if alpha >= beta:
+                break
+    table[key] = (best, -1 if best <= start else 1 if best >= beta else 0)
+    return best
+
+
+def _build_table():
+    """Таблица лучших ходов для всех достижимых позиций (в позиции
+    ходящий - 1, соперник - 2; первым может ходить любой из игроков).
+    Байт таблицы - move + 9 * (оценка + 1) или NO_MOVE"""
+    table = bytearray([NO_MOVE]) * 3 ** 9
+    transpositions = {}
+    stack = [(0,) * 9]
+    while stack:
+        board = stack.pop()
+        index = _index(board)
+        if (table[index] != NO_MOVE or _is_win(board, 2)
+                or 0 not in board):
+            continue
+        best_move, best = None, -2
+        for move in range(9):
+            if board[move] == 0:
+                child = _after(board, move)
+                value = -_negamax(child, -2, 2, transpositions)
+                if value > best:
+                    best_move, best = move, value
+                stack.append(child)
+        table[index] = best_move + 9 * (best + 1)
+    return bytes(table)
+
+
+@lru_cache(maxsize=None)
+def perfect_table(path=None):
+    """Таблица лучших ходов (_build_table). Строится при первом
+    обращении; если задан path - загружается из файла / сохраняется"""
+    if path is not None and os.path.exists(path):
+        with open(path, 'rb') as stream:
+            table = stream.read()
+        if len(table) == 3 ** 9:
+            return table
+    table = _build_table()
+    if path is not None:
+        with open(path, 'wb') as stream:
+            stream.write(table)
+    return table
+
+
+class _Node:
+    """Узел дерева поиска. wins - сумма результатов (1 - выигрыш,
+    0.5 - ничья) для игрока, сделавшего ход в этот узел; untried -
+    еще не раскрытые ходы (пусто у позиции, где игра окончена)
+    в случайном порядке генератора rng"""
+    __slots__ = ('children', 'untried', 'visits', 'wins')
+
+    def __init__(self, free=0, rng=random):
+        self.children = {}
+        self.untried = list(free_cells(free))
+        rng.shuffle(self.untried)
+        self.visits = 0
+        self.wins = 0.0
+
+
+class _Tree:
+    """Дерево поиска MCTSPlayer в одном процессе"""
+
+    def __init__(self, exploration, rng=random):
+        self.exploration = exploration
+        self.rng = rng
+        self.root = None
+        self.masks = (0, 0)
+
+    def search(self, own, other, rows, columns, k, playouts, time_limit):
+        """Поиск из позиции (own - ходящий, other - соперник).
+        Возвращает числа посещений ходов из корня"""
+        field = geometry(rows, columns, k)
+        self.__reuse(own, other, field)
+        deadline = time.monotonic() + time_limit
+        done = 0
+        while (done < playouts if playouts is not None
+               else not done or time.monotonic() < deadline):
+            self.__playout(own, other, field)
+            done += 1
+        return {cell: child.visits
+                for cell, child in self.root.children.items()}
+
+    def __reuse(self, own, other, field):
+        """Корень - внук прежнего корня, если позиция получена из
+        прежней своим ходом и ходом соперника, иначе новый узел"""
+        old_own, old_other = self.masks
+        self.masks = (own, other)
+        mine, theirs = own & ~old_own, other & ~old_other
+        if (self.root is not None and old_own & ~own == 0
+                and old_other & ~other == 0
+                and mine.bit_count() == theirs.bit_count() == 1):
+            child = self.root.children.get(mine.bit_length() - 1)
+            if child is not None:
+                child = child.children.get(theirs.bit_length() - 1)
+            if child is not None:
+                self.root = child
+                return
+        self.root = _Node(field.full & ~(own | other), self.rng)
+
+    def __playout(self, own, other, field):
+        """Одна итерация: выбор по UCT, раскрытие узла, случайное
+        доигрывание и обновление результатов на пути"""
+        boards = [own, other]
+        node, path, side = self.root, [self.root], 0
+        winner = None
+        while True:
+            if node.untried:
+                cell = node.untried.pop()
+                boards[side] |= 1 << cell
+                if _is_line(boards[side], field.lines[cell]):
+                    child, winner = _Node(), side
+                else:
+                    child = _Node(field.full & ~(boards[0] | boards[1]),
+                                  self.rng)
+                node.children[cell] = child
+                path.append(child)
+                side ^= 1
+                break
+            if not node.children:
+                break
+            log = math.log(node.visits)
+            cell, node = max(node.children.items(),
+                             key=lambda item: self.__uct(item[1], log))
+            boards[side] |= 1 << cell
+            path.append(node)
+            if _is_line(boards[side], field.lines[cell]):
+                winner = side
+            side ^= 1
+            if winner is not None:
+                break
+        if winner is None and path[-1].untried:
+            winner = _rollout(boards, side, field, self.rng)
+        for depth, visited in enumerate(path):
+            visited.visits += 1
+            mover = (depth - 1) % 2
+            if winner is None:
+                visited.wins += 0.5
+            elif winner == mover:
+                visited.wins += 1
+
+    def __uct(self, node, log):
+        return (node.wins / node.visits
+                + self.exploration * math.sqrt(log / node.visits))
+
+
+def _is_line(mask, lines):
+    return any(mask & line == line for line in lines)
+
+
+def _rollout(boards, side, field, rng=random):
+    """Доигрывание случайными ходами, начиная с игрока side.
+    Возвращает номер выигравшего игрока (0 / 1) или None - ничья"""
+    boards = list(boards)
+    cells = list(free_cells(field.full & ~(boards[0] | boards[1])))
+    rng.shuffle(cells)
+    for cell in cells:
+        boards[side] |= 1 << cell
+        if _is_line(boards[side], field.lines[cell]):
+            return side
+        side ^= 1
+    return None
+
+
+def _mcts_worker(connection, parent, exploration, seed):
+    """Процесс поиска MCTSPlayer: свое дерево и свой генератор.
+    Унаследованный конец канала parent закрывается, поэтому когда
+    MCTSPlayer закрывает свой конец, recv получает EOF"""
+    parent.close()
+    tree = _Tree(exploration, random.Random(seed))
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        connection.send(tree.search(*task))
 
 
 if __name__ == "__main__":
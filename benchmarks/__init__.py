@@ -0,0 +1,267 @@
+"""
+Воспроизводимые замеры скорости игр.
+Сценарий - функция от зерна, которая готовит данные и возвращает
+функцию замера; функция замера выполняет работу и возвращает число
+сделанных операций. Перед подготовкой вызывается random.seed(зерно),
+поэтому каждый запуск выполняет одну и ту же работу.
+Запуск: python -m benchmarks (см. benchmarks/__main__.py).
+"""
+import json
+import random
+import time
+import tracemalloc
+
+from Minesweeper import GamePole as MinesPole
+from Minesweeper_generator import generate
+from Minesweeper_solver import best_move
+from Sea_Battle import GamePole, HunterPlayer, SeaBattle, ShipError
+from TicTacToe import MCTSPlayer, PerfectPlayer, TicTacToe
+
+SCENARIOS = {}
+MEMORY_SLACK_KB = 64  # меньшее изменение пиковой памяти не считается
+
+
+def scenario(function):
+    """Регистрация сценария под именем функции"""
+    SCENARIOS[function.__name__] = function
+    return function
+
+
+def _placement(size, assort=None, count=20):
+    def run():
+        for _ in range(count):
+            GamePole(size, assort).init()
+        return count
+    return run
+
+
+@scenario
+def sea_placement_10(seed):
+    return _placement(10)
+
+
+@scenario
+def sea_placement_7_dense(seed):
+    return _placement(7, count=5)
+
+
+@scenario
+def sea_placement_100_sparse(seed):
+    return _placement(100, ((200, 1), (100, 2), (50, 3), (25, 4)), count=2)
+
+
+def _infeasible(size, assort, count):
+    def run():
+        for _ in range(count):
+            try:
+                GamePole(size, assort).init()
+            except ShipError:
+                pass
+        return count
+    return run
+
+
+@scenario
+def sea_placement_infeasible(seed):
+    """Поле, на котором расстановка невозможна по площади (ShipError
+    без перебора)"""
+    return _infeasible(6, None, 20)
+
+
+@scenario
+def sea_placement_infeasible_search(seed):
+    """Площади хватает, но расставить нельзя: 5 однопалубных кораблей
+    на поле 4x4 (ShipError после всех перезапусков перебора)"""
+    return _infeasible(4, ((5, 1),), 2)
+
+
+@scenario
+def sea_game_10(seed):
+    """Партия компьютер против компьютера; операция - выстрел"""
+    def run():
+        game = SeaBattle(10, human=HunterPlayer(), pc=HunterPlayer(),
+                         headless=True)
+        return game.play()['turns']
+    return run
+
+
+@scenario
+def sea_snapshot_10(seed):
+    """Снимок и восстановление партии в середине игры (откат хода)"""
+    game = SeaBattle(10, human=HunterPlayer(), pc=HunterPlayer(),
+                     headless=True)
+    for _ in range(30):
+        game.next_move()
+
+    def run():
+        for _ in range(2000):
+            game.restore(game.snapshot())
+        return 2000
+    return run
+
+
+@scenario
+def mines_init_500(seed):
+    def run():
+        MinesPole(500, 500, 40000).init_pole()
+        return 1
+    return run
+
+
+@scenario
+def mines_flood_200(seed):
+    """Открытие всего поля без мин одним ходом (худший случай обхода);
+    операция - ячейка"""
+    game = MinesPole(200, 200, 0)
+    game.init_pole()
+
+    def run():
+        game.open_cell(0, 0)
+        return 200 * 200
+    return run
+
+
+@scenario
+def mines_solver_expert(seed):
+    """Решение поля 30x16 с 99 минами без угадывания; операция - ход"""
+    start, mines = generate(30, 16, 99)
+
+    def run():
+        game = MinesPole(30, 16, 99)
+        game.init_pole(mines)
+        game.open_cell(*divmod(start, 30))
+        moves = 0
+        while not game.game_over:
+            game.open_cell(*best_move(game))
+            moves += 1
+        return moves
+    return run
+
+
+@scenario
+def mines_solver_100(seed):
+    """Первые ходы решателя на поле 100x100 с 1600 минами (вероятности
+    для больших полей без переполнения float); операция - ход"""
+    def run():
+        game = MinesPole(100, 100, 1600)
+        game.init_pole()
+        moves = 0
+        while not game.game_over and moves < 10:
+            game.open_cell(*best_move(game))
+            moves += 1
+        return moves
+    return run
+
+
+@scenario
+def tictactoe_random_moves(seed):
+    """Случайные партии 15x15 до 5 в ряд; операция - ход с проверкой
+    выигрыша"""
+    def run():
+        moves = 0
+        for _ in range(20):
+            game = TicTacToe(rows=15, columns=15, k=5, computer=object())
+            value = game.HUMAN_X
+            while game:
+                game[game.find_empty_cell()] = value
+                value = 3 - value
+                moves += 1
+        return moves
+    return run
+
+
+@scenario
+def tictactoe_check_win(seed):
+    """Проверка выигрыша при постановке значка (TicTacToe.__setitem__)
+    на поле 15x15 до 5 в ряд по заранее выбранным ходам; операция - ход"""
+    cells = random.sample(range(225), 225)
+
+    def run():
+        for _ in range(20):
+            game = TicTacToe(rows=15, columns=15, k=5, computer=object())
+            for step, cell in enumerate(cells):
+                game[divmod(cell, 15)] = 1 + step % 2
+        return 20 * 225
+    return run
+
+
+@scenario
+def tictactoe_perfect_move(seed):
+    player = PerfectPlayer()
+    game = TicTacToe(computer=player)
+    game[1, 1] = game.HUMAN_X
+    player.choose(game, game.COMPUTER_O)
+
+    def run():
+        for _ in range(20000):
+            player.choose(game, game.COMPUTER_O)
+        return 20000
+    return run
+
+
+@scenario
+def tictactoe_mcts_move(seed):
+    def run():
+        player = MCTSPlayer(playouts=500, workers=1)
+        game = TicTacToe(rows=7, columns=7, k=4, computer=player)
+        player.choose(game, game.COMPUTER_O)
+        return 1
+    return run
+
+
+def measure(name, seed=0, repeat=3):
+    """Замер сценария: операций в секунду (лучший из repeat запусков)
+    и пиковая память по tracemalloc (отдельный запуск), КБ"""
+    best = 0.0
+    for attempt in range(repeat):
+        random.seed(seed + attempt)
+        run = SCENARIOS[name](seed + attempt)
+        start = time.perf_counter()
+        ops = run()
+        best = max(best, ops / (time.perf_counter() - start))
+    random.seed(seed)
+    tracemalloc.start()
+    try:
+        SCENARIOS[name](seed)()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'ops_per_sec': best, 'peak_kb': peak / 1024}
+
+
+def run_all(names=None, seed=0, repeat=3):
+    return {name: measure(name, seed, repeat)
+            for name in names or SCENARIOS}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Сравнение с базовыми результатами: для каждого сценария -
+    отношение скорости к базовой и памяти к базовой, а также признак
+    регрессии (скорость или память хуже больше чем на tolerance;
+    память - еще и больше чем на MEMORY_SLACK_KB)"""
+    report = {}
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        speed = result['ops_per_sec'] / base['ops_per_sec']
+        memory = (result['peak_kb'] / base['peak_kb']
+                  if base['peak_kb'] else 1.0)
+        report[name] = {'speed': speed, 'memory': memory,
+                        'regression': (
+                            speed < 1 - tolerance
+                            or memory > 1 + tolerance
+                            and result['peak_kb'] - base['peak_kb']
+                            > MEMORY_SLACK_KB)}
+    return report
+
+
+def load(path):
+    with open(path) as stream:
+        return json.load(stream)
+
+
+def save(results, path):
+    with open(path, 'w') as stream:
+        json.dump(results, stream, indent=2, sort_keys=True)
+        stream.write('\n')
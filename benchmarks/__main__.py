@@ -0,0 +1,50 @@
+"""
+python -m benchmarks [сценарий ...] [--seed N] [--repeat N]
+                     [--baseline файл] [--save] [--tolerance доля]
+Выводит операции в секунду и пиковую память каждого сценария и сравнивает
+их с базовым файлом (по умолчанию benchmarks/baseline.json). С --save
+результаты записываются в базовый файл. Код возврата 1 - есть регрессии.
+Базовый файл зависит от машины: перед сравнением изменений его стоит
+пересоздать с --save на той же машине.
+"""
+import argparse
+import os
+import sys
+
+from benchmarks import SCENARIOS, compare, load, run_all, save
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('names', nargs='*', choices=[[], *SCENARIOS],
+                        metavar='сценарий')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = run_all(args.names, args.seed, args.repeat)
+    baseline = load(args.baseline) if os.path.exists(args.baseline) else {}
+    report = compare(results, baseline, args.tolerance)
+    print(f"{'сценарий':<28}{'опер./с':>14}{'память КБ':>12}"
+          f"{'скорость':>10}{'память':>8}")
+    for name, result in results.items():
+        line = (f"{name:<28}{result['ops_per_sec']:>14.1f}"
+                f"{result['peak_kb']:>12.1f}")
+        if name in report:
+            line += (f"{report[name]['speed']:>10.2f}"
+                     f"{report[name]['memory']:>8.2f}")
+            if report[name]['regression']:
+                line += "  регрессия"
+        print(line)
+    if args.save:
+        save({**baseline, **results}, args.baseline)
+    return int(any(item['regression'] for item in report.values()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Единый программный интерфейс к трем играм (без ввода / вывода в консоль):
+reset(seed) - новая партия, возвращает наблюдение;
+step(action) - ход агента, возвращает (наблюдение, награда, конец, info).
+Действие - номер клетки (строка * ширина поля + столбец), наблюдение -
+bytes с байтом на клетку. Награда 1 - агент выиграл, -1 - проиграл,
+0 - партия продолжается или ничья.
+У каждой среды свой генератор случайных чисел rng: reset(seed) с зерном
+заменяет его на random.Random(seed), поэтому партия повторяется
+независимо от других сред и от общего генератора модуля random.
+VectorEnv - набор одинаковых сред, которые делают ход одновременно,
+по желанию - в нескольких процессах.
+"""
+import os
+import random
+from multiprocessing import Pipe, Process
+
+from Minesweeper import GamePole as MinesPole
+from Sea_Battle import HunterPlayer, SeaBattle
+from TicTacToe import RandomPlayer, TicTacToe
+
+
+class Env:
+    """Среда одной игры"""
+    rng = None
+
+    def seed_rng(self, seed=None):
+        """Генератор для новой партии: с зерном seed - новый, без зерна -
+        прежний (при первом вызове - со случайным зерном)"""
+        if seed is not None or self.rng is None:
+            self.rng = random.Random(seed)
+        return self.rng
+
+    def reset(self, seed=None):
+        raise NotImplementedError
+
+    def step(self, action):
+        raise NotImplementedError
+
+
+class TicTacToeEnv(Env):
+    """Крестики-нолики: агент ставит крестики, соперник opponent
+    (стратегия TicTacToe.Player, по умолчанию - RandomPlayer с генератором
+    среды) отвечает сразу после хода агента.
+    Наблюдение: 0 - свободно, 1 - крестик агента, 2 - нолик соперника"""
+
+    def __init__(self, rows=3, columns=3, k=3, opponent=None, first=True):
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.opponent = opponent
+        self.first = first
+        self.game = None
+
+    def reset(self, seed=None):
+        rng = self.seed_rng(seed)
+        self.game = TicTacToe(self.first, self.opponent or RandomPlayer(rng),
+                              self.rows, self.columns, self.k, rng=rng)
+        if not self.first:
+            self.game.next_step()
+        return self.observation()
+
+    def step(self, action):
+        game = self.game
+        game[divmod(action, self.columns)] = game.HUMAN_X
+        if game:
+            game.computer_go()
+        reward = (1.0 if game.is_human_win
+                  else -1.0 if game.is_computer_win else 0.0)
+        return self.observation(), reward, not game, {}
+
+    def observation(self):
+        return bytes(self.game[divmod(cell, self.columns)]
+                     for cell in range(self.rows * self.columns))
+
+
+class MinesweeperEnv(Env):
+    """Сапер: действие - открыть ячейку. Наблюдение - GamePole.visible
+    (число мин вокруг открытой ячейки, HIDDEN - закрытая ячейка)"""
+
+    def __init__(self, m=9, n=9, total_mines=10):
+        self.m = m
+        self.n = n
+        self.total_mines = total_mines
+        self.game = None
+
+    def reset(self, seed=None):
+        self.game = MinesPole(self.m, self.n, self.total_mines,
+                              rng=self.seed_rng(seed))
+        self.game.init_pole()
+        return self.game.visible()
+
+    def step(self, action):
+        game = self.game
+        game.open_cell(*divmod(action, self.m))
+        reward = 0.0
+        if game.game_over:
+            reward = 1.0 if game.win else -1.0
+        return game.visible(), reward, game.game_over, {}
+
+
+class SeaBattleEnv(Env):
+    """Морской бой: агент стреляет по полю компьютера (действие -
+    номер клетки y * size + x), компьютер - стратегия pc (класс игрока
+    Sea_Battle) отвечает после каждого промаха агента.
+    Наблюдение - SeaBattle.observation, info['hit'] - результат выстрела"""
+
+    def __init__(self, size=10, assort=None, pc=HunterPlayer):
+        self.size = size
+        self.assort = assort
+        self.pc = pc
+        self.game = None
+
+    def reset(self, seed=None):
+        self.game = SeaBattle(self.size, assort=self.assort, pc=self.pc(),
+                              headless=True, rng=self.seed_rng(seed))
+        return self.game.observation()
+
+    def step(self, action):
+        game = self.game
+        y, x = divmod(action, self.size)
+        hit = game.shoot((x, y))
+        reward = 0.0
+        if game.game_over:
+            reward = 1.0 if game.stats['winner'] == 'human' else -1.0
+        return game.observation(), reward, game.game_over, {'hit': hit}
+
+
+class _Shard:
+    """Часть сред VectorEnv в одном процессе"""
+
+    def __init__(self, make_env, count):
+        self.envs = [make_env() for _ in range(count)]
+
+    def reset(self, seeds):
+        return [env.reset(seed) for env, seed in zip(self.envs, seeds)]
+
+    def step(self, actions):
+        """Ход во всех средах; законченная партия сразу начинается
+        заново, ее последнее наблюдение - в info['final_observation']"""
+        results = []
+        for env, action in zip(self.envs, actions):
+            observation, reward, done, info = env.step(action)
+            if done:
+                info['final_observation'] = observation
+                observation = env.reset()
+            results.append((observation, reward, done, info))
+        return results
+
+
+def _shard_worker(connection, make_env, count):
+    """Процесс VectorEnv: выполняет команды ('reset' / 'step', данные).
+    Ответ - (результат, None) или (None, исключение команды): процесс
+    продолжает работу, а исключение возникает в основном процессе"""
+    shard = _Shard(make_env, count)
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        command, data = message
+        try:
+            reply = getattr(shard, command)(data), None
+        except Exception as error:
+            reply = None, error
+        connection.send(reply)
+
+
+class VectorEnv:
+    """
+    count сред make_env() (make_env - класс среды или функция без
+    аргументов; для workers > 1 должна передаваться в процесс),
+    которые делают ход одновременно.
+    workers - число процессов (1 - все среды в текущем процессе,
+    None - по числу ядер), среды делятся между процессами поровну
+    """
+
+    def __init__(self, make_env, count, workers=1):
+        workers = min(workers or os.cpu_count() or 1, count)
+        sizes = [count // workers + (i < count % workers)
+                 for i in range(workers)]
+        self.count = count
+        self.__sizes = sizes
+        self.__shard = None
+        self.__connections = []
+        if workers == 1:
+            self.__shard = _Shard(make_env, count)
+            return
+        for size in sizes:
+            connection, child = Pipe()
+            Process(target=_shard_worker, args=(child, make_env, size),
+                    daemon=True).start()
+            self.__connections.append(connection)
+
+    def reset(self, seed=None):
+        """Новые партии во всех средах (среда i - с зерном seed + i).
+        Возвращает список наблюдений"""
+        seeds = [None if seed is None else seed + i
+                 for i in range(self.count)]
+        return self.__run('reset', seeds)
+
+    def step(self, actions):
+        """Ход во всех средах. Возвращает списки наблюдений, наград,
+        признаков конца партии и info"""
+        results = self.__run('step', actions)
+        return tuple(map(list, zip(*results)))
+
+    def __run(self, command, data):
+        if self.__shard is not None:
+            return getattr(self.__shard, command)(data)
+        start = 0
+        for connection, size in zip(self.__connections, self.__sizes):
+            connection.send((command, data[start:start + size]))
+            start += size
+        results, errors = [], []
+        for connection in self.__connections:
+            result, error = connection.recv()
+            if error is None:
+                results.extend(result)
+            else:
+                errors.append(error)
+        if errors:
+            raise errors[0]
+        return results
+
+    def close(self):
+        """Остановка процессов"""
+        for connection in self.__connections:
+            connection.send(None)
+            connection.close()
+        self.__connections = []
@@ -0,0 +1,17 @@
+"""
+Генератор случайных чисел для игр: TicTacToe, GamePole обеих игр,
+SeaBattle и стратегии игроков принимают параметр rng и передают его
+в make_rng.
+"""
+import random
+
+
+def make_rng(rng=None):
+    """Генератор случайных чисел: None - общий генератор модуля random,
+    число или строка - новый random.Random с этим зерном,
+    иначе сам rng (объект с методами random.Random)"""
+    if rng is None:
+        return random
+    if isinstance(rng, (int, str, bytes)):
+        return random.Random(rng)
+    return rng
@@ -0,0 +1,150 @@
+"""
+Инструментирование горячих мест игр: число вызовов и гистограммы времени
+выполнения (по степеням двойки наносекунд).
+Включается явно: enable() подменяет методы классов обертками, disable()
+возвращает исходные методы, поэтому в выключенном состоянии накладных
+расходов нет. Пример:
+    with profile() as stats:
+        simulate(100, workers=1)
+    print(stats.summary())
+Данные собираются только в текущем процессе: simulate с пулом процессов
+(по умолчанию) и VectorEnv / MCTSPlayer с workers > 1 выполняют работу
+в других процессах и ничего не записывают - для замеров передавайте
+workers=1.
+"""
+import json
+import time
+from contextlib import contextmanager
+from functools import wraps
+from importlib import import_module
+
+# (модуль, класс, метод, атрибут-счетчик объекта после вызова или None)
+TARGETS = (
+    ('Sea_Battle', 'GamePole', 'check_hit', None),
+    ('Sea_Battle', 'GamePole', 'move_ships', None),
+    ('Sea_Battle', 'GamePole', '_GamePole__placement_ships',
+     'placement_attempts'),
+    ('Sea_Battle', 'GamePole', 'get_pole', None),
+    ('Minesweeper', 'GamePole', 'open_cell', None),
+    ('Minesweeper', 'GamePole', 'count_open_cell', None),
+    ('TicTacToe', 'TicTacToe', '__setitem__', None),
+)
+
+_patched = []  # (класс, имя метода, исходный метод)
+
+
+class Stats:
+    """
+    Накопленные данные по операциям (имя - "модуль.класс.метод"):
+    calls - число вызовов; total - суммарное время, нс;
+    histograms - {k: число вызовов длительностью от 2^(k-1) до 2^k нс};
+    counters - суммы атрибутов-счетчиков (попытки расстановки кораблей)
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.total = {}
+        self.histograms = {}
+        self.counters = {}
+
+    def record(self, name, elapsed):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.total[name] = self.total.get(name, 0) + elapsed
+        histogram = self.histograms.setdefault(name, {})
+        bucket = elapsed.bit_length()
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def percentile(self, name, share):
+        """Верхняя граница (нс) интервала гистограммы, в который
+        попадает доля share вызовов"""
+        histogram = self.histograms[name]
+        limit = share * self.calls[name]
+        seen = 0
+        for bucket in sorted(histogram):
+            seen += histogram[bucket]
+            if seen >= limit:
+                return 1 << bucket
+        return 1 << max(histogram)
+
+    def as_dict(self):
+        calls = {}
+        for name, count in self.calls.items():
+            histogram = sorted(self.histograms[name].items())
+            calls[name] = {'count': count,
+                           'total_ns': self.total[name],
+                           'mean_ns': self.total[name] / count,
+                           'histogram': {str(1 << bucket): number
+                                         for bucket, number in histogram}}
+        return {'calls': calls, 'counters': dict(self.counters)}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def summary(self):
+        """Текстовая таблица: вызовы, среднее время и перцентили"""
+        lines = [f"{'операция':<44}{'вызовы':>10}{'сред. мкс':>12}"
+                 f"{'p50 мкс':>10}{'p99 мкс':>10}"]
+        for name in sorted(self.calls):
+            count = self.calls[name]
+            lines.append(f"{name:<44}{count:>10}"
+                         f"{self.total[name] / count / 1000:>12.2f}"
+                         f"{self.percentile(name, 0.5) / 1000:>10.2f}"
+                         f"{self.percentile(name, 0.99) / 1000:>10.2f}")
+        for name in sorted(self.counters):
+            lines.append(f"{name:<44}{self.counters[name]:>10}")
+        return "\n".join(lines)
+
+
+def _wrap(method, name, counter, stats):
+    """Обертка метода: время вызова, а если задан counter - значение
+    атрибута counter объекта после вызова"""
+    clock = time.perf_counter_ns
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats.record(name, clock() - start)
+            if counter is not None:
+                stats.count(counter[1], getattr(args[0], counter[0]))
+    return wrapper
+
+
+def enable(stats=None, targets=TARGETS):
+    """Подмена методов targets обертками, пишущими в stats.
+    Возвращает stats"""
+    disable()
+    stats = Stats() if stats is None else stats
+    for module, class_name, method_name, counter in targets:
+        cls = getattr(import_module(module), class_name)
+        method = cls.__dict__[method_name]
+        label = (method_name if method_name.endswith('__')
+                 else method_name.rpartition('__')[2])
+        name = f"{module}.{class_name}.{label}"
+        if counter is not None:
+            counter = (counter, f"{module}.{class_name}.{counter}")
+        _patched.append((cls, method_name, method))
+        setattr(cls, method_name, _wrap(method, name, counter, stats))
+    return stats
+
+
+def disable():
+    """Возврат исходных методов"""
+    while _patched:
+        cls, method_name, method = _patched.pop()
+        setattr(cls, method_name, method)
+
+
+@contextmanager
+def profile(stats=None, targets=TARGETS):
+    """Инструментирование на время блока with"""
+    stats = enable(stats, targets)
+    try:
+        yield stats
+    finally:
+        disable()